@@ -1,5 +1,131 @@
+import heapq
 from collections import UserDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any
+
+
+@dataclass
+class BlackBoardStats:
+    evicted: int = 0
+    expired: int = 0
 
 
 class BlackBoard(UserDict):
-    pass
+    def __init__(self, *args, **kwargs):
+        self.max_entries: int | None = None
+        self.ttl: float | None = None
+        self.prefix_ttl: dict[str, float] = {}
+        self.stats = BlackBoardStats()
+        self._expires: dict[Any, float] = {}
+        # (expiry time, sequence, key) ordered by expiry time. The entries of
+        # overwritten or deleted keys are skipped when they are popped.
+        self._expiry_heap: list[tuple[float, int, Any]] = []
+        self._sequence = 0
+        super().__init__(*args, **kwargs)
+
+    def configure(
+        self,
+        max_entries: int | None = None,
+        ttl: float | None = None,
+        prefix_ttl: dict[str, float] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix_ttl = prefix_ttl if prefix_ttl is not None else {}
+        self._evict()
+
+    def set(self, key: Any, item: Any, ttl: float | None = None) -> None:
+        if key in self.data:
+            # re-insert to move the key to the most recently used position
+            del self.data[key]
+        self.data[key] = item
+
+        ttl = ttl if ttl is not None else self._default_ttl(key)
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            expires = monotonic() + ttl
+            self._expires[key] = expires
+            self._sequence += 1
+            heapq.heappush(self._expiry_heap, (expires, self._sequence, key))
+
+        # the keys which are written but never read are removed here
+        self.purge()
+        self._evict()
+
+    def purge(self) -> None:
+        heap = self._expiry_heap
+        now = monotonic()
+        while heap and heap[0][0] <= now:
+            expires, _, key = heapq.heappop(heap)
+            if self._expires.get(key) == expires:
+                self._expire(key)
+
+        # drop the stale entries of the keys which are overwritten repeatedly
+        if len(heap) > 2 * len(self._expires) + 64:
+            self._expiry_heap = [e for e in heap if self._expires.get(e[2]) == e[0]]
+            heapq.heapify(self._expiry_heap)
+
+    def __setitem__(self, key, item):
+        self.set(key, item)
+
+    def __getitem__(self, key):
+        if key not in self.data:
+            return super().__getitem__(key)
+
+        if self._is_expired(key):
+            self._expire(key)
+            raise KeyError(key)
+
+        if self.max_entries is not None:
+            item = self.data.pop(key)
+            self.data[key] = item
+            return item
+
+        return self.data[key]
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self._expires.pop(key, None)
+
+    def __contains__(self, key):
+        if key not in self.data:
+            return False
+        if self._is_expired(key):
+            self._expire(key)
+            return False
+        return True
+
+    def __iter__(self):
+        self.purge()
+        return iter(list(self.data))
+
+    def __len__(self):
+        self.purge()
+        return len(self.data)
+
+    def _default_ttl(self, key: Any) -> float | None:
+        if self.prefix_ttl and isinstance(key, str):
+            matched = [p for p in self.prefix_ttl if key.startswith(p)]
+            if matched:
+                return self.prefix_ttl[max(matched, key=len)]
+        return self.ttl
+
+    def _is_expired(self, key: Any) -> bool:
+        expires = self._expires.get(key)
+        return expires is not None and expires <= monotonic()
+
+    def _expire(self, key: Any) -> None:
+        del self[key]
+        self.stats.expired += 1
+
+    def _evict(self) -> None:
+        if self.max_entries is None:
+            return
+        # expired keys are dropped before live keys are evicted
+        if len(self.data) > self.max_entries:
+            self.purge()
+        while len(self.data) > self.max_entries:
+            del self[next(iter(self.data))]
+            self.stats.evicted += 1
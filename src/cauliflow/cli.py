@@ -4,9 +4,11 @@ from logging import DEBUG, WARNING, getLogger
 import click
 
 from cauliflow.context import ContextFlows, ctx_flows, ctx_macros
+from cauliflow.flow import Flows
 from cauliflow.loader import flow_from_yaml
 from cauliflow.logging import get_logger
 from cauliflow.plugin_manager import PluginManager
+from cauliflow.shutdown import run_shutdown
 
 _logger = get_logger(__name__)
 
@@ -41,7 +43,14 @@ def run(macros, debug, filename):
     ctx_macros.set(mcr)
     if debug:
         _logger.debug(f"macros={mcr}")
-    asyncio.run(flows.run())
+    asyncio.run(_run_flows(flows))
+
+
+async def _run_flows(flows: Flows) -> None:
+    try:
+        await flows.run()
+    finally:
+        await run_shutdown()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,50 @@
 from collections import UserDict
+from collections.abc import Mapping
 
 
 class FlowData(UserDict):
+    def __init__(self, dict=None, /, parent: Mapping | None = None, **kwargs):
+        self.parent = parent
+        super().__init__(dict, **kwargs)
+
+    def fork(self) -> "FlowData":
+        # The new flowdata refers to self as a read-only parent instead of copying it.
+        # Keys of the parent are visible, and new keys are stored only in the child.
+        return FlowData(parent=self)
+
     def __setitem__(self, key, item):
-        if key in self.data:
+        if key in self:
             raise KeyError(f"Key '{key}' already exists. Overwriting is not allowed.")
         self.data[key] = item
+
+    def __getitem__(self, key):
+        if key in self.data:
+            return self.data[key]
+        if self.parent is not None and key in self.parent:
+            return self.parent[key]
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if key in self.data:
+            return True
+        return self.parent is not None and key in self.parent
+
+    def __iter__(self):
+        if self.parent is None:
+            yield from self.data
+            return
+        yield from self.parent
+        for key in self.data:
+            if key not in self.parent:
+                yield key
+
+    def __len__(self):
+        if self.parent is None:
+            return len(self.data)
+        return len(self.parent) + sum(1 for k in self.data if k not in self.parent)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def copy(self) -> "FlowData":
+        return FlowData(dict(self.items()))
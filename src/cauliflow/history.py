@@ -0,0 +1,213 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from cauliflow.logging import get_logger
+from cauliflow.shutdown import register_shutdown
+
+_logger = get_logger(__name__)
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("value", "<f8"),
+        ("status", "<i2"),
+        ("severity", "<i2"),
+    ],
+    align=True,
+)
+
+# magic, version, record size, index interval, number of records
+_HEADER = struct.Struct("<8sIIQQ")
+_HEADER_SIZE = 64
+_MAGIC = b"CFHIST\x00\x00"
+_VERSION = 1
+
+INDEX_INTERVAL = 1024
+_INITIAL_CAPACITY = 4096
+
+
+class HistoryFile:
+    # Append-only file of fixed size records of a PV.
+    # The records are accessed through a memory map, and the file is grown by
+    # doubling its capacity. The timestamp of every INDEX_INTERVAL-th record
+    # is kept in memory as a sparse index to find a time range.
+    def __init__(self, path: Path, index_interval: int = INDEX_INTERVAL):
+        self.path = path
+        self.index_interval = index_interval
+        self.count = 0
+        self.index: list[float] = []
+
+        if not path.exists() or path.stat().st_size == 0:
+            self._create()
+        self._map()
+        self._load()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.records)
+
+    def append(
+        self, timestamp: float, value: float, status: int = 0, severity: int = 0
+    ) -> bool:
+        if self.count and timestamp < self.records["timestamp"][self.count - 1]:
+            # the time index requires the records to be ordered by timestamp
+            return False
+
+        if self.count == self.capacity:
+            self._grow()
+
+        self.records[self.count] = (timestamp, value, status, severity)
+        if self.count % self.index_interval == 0:
+            self.index.append(timestamp)
+        self.count += 1
+        _HEADER.pack_into(self.mm, 0, *self._header())
+        return True
+
+    def query(self, start: float | None = None, end: float | None = None) -> np.ndarray:
+        # The returned array is a view of the memory map, not a copy.
+        start_idx = 0 if start is None else self._search(start, "left")
+        end_idx = self.count if end is None else self._search(end, "right")
+        return self.records[start_idx : max(start_idx, end_idx)]
+
+    def flush(self) -> None:
+        self.mm.flush()
+
+    def _search(self, timestamp: float, side: str) -> int:
+        # find the block with the sparse index, then search only in the block
+        if side == "left":
+            block = max(bisect_left(self.index, timestamp) - 1, 0)
+        else:
+            block = max(bisect_right(self.index, timestamp) - 1, 0)
+        lo = block * self.index_interval
+        hi = min(lo + self.index_interval * 2, self.count)
+        timestamps = self.records["timestamp"][lo:hi]
+        return lo + int(np.searchsorted(timestamps, timestamp, side=side))
+
+    def _header(self) -> tuple:
+        return (
+            _MAGIC,
+            _VERSION,
+            RECORD_DTYPE.itemsize,
+            self.index_interval,
+            self.count,
+        )
+
+    def _create(self) -> None:
+        with self.path.open(mode="wb") as f:
+            header = _HEADER.pack(*self._header())
+            f.write(header.ljust(_HEADER_SIZE, b"\x00"))
+            f.truncate(_HEADER_SIZE + RECORD_DTYPE.itemsize * _INITIAL_CAPACITY)
+
+    def _map(self, size: int | None = None) -> None:
+        with self.path.open(mode="r+b") as f:
+            if size is None:
+                self.mm = mmap.mmap(f.fileno(), 0)
+            elif os.name == "nt":
+                # Windows cannot resize a mapped file, but extends the file
+                # to the length of a new map
+                self.mm = mmap.mmap(f.fileno(), size)
+            else:
+                f.truncate(size)
+                self.mm = mmap.mmap(f.fileno(), 0)
+        capacity = (len(self.mm) - _HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.records = np.frombuffer(
+            self.mm, dtype=RECORD_DTYPE, count=capacity, offset=_HEADER_SIZE
+        )
+
+    def _load(self) -> None:
+        magic, version, size, interval, count = _HEADER.unpack_from(self.mm, 0)
+        if magic != _MAGIC or version != _VERSION or size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{self.path} is not a valid history file")
+        self.index_interval = interval
+        self.count = count
+        self.index = self.records["timestamp"][:count:interval].tolist()
+
+    def _grow(self) -> None:
+        size = _HEADER_SIZE + RECORD_DTYPE.itemsize * self.capacity * 2
+        mm = self.mm
+        mm.flush()
+        del self.records
+        try:
+            mm.close()
+        except BufferError:
+            # Views returned by query still refer to the old map.
+            # It is released when the last view is gone.
+            pass
+        self._map(size)
+
+
+class HistoryStore:
+    # A directory of history files, one file per PV
+    def __init__(self, directory: Path, index_interval: int = INDEX_INTERVAL):
+        self.directory = directory
+        self.index_interval = index_interval
+        self.files: dict[str, HistoryFile] = {}
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, pvname: str, create: bool = True) -> HistoryFile | None:
+        history = self.files.get(pvname)
+        if history is not None:
+            return history
+
+        # ":" is encoded because it is a separator of alternate data streams on NTFS
+        path = self.directory / f"{quote(pvname, safe='')}.hist"
+        if not create and not path.exists():
+            return None
+        history = HistoryFile(path, self.index_interval)
+        self.files[pvname] = history
+        return history
+
+    def append(self, record: dict) -> bool:
+        if not record.get("ok", True):
+            return False
+        try:
+            value = float(record["value"])
+        except (TypeError, ValueError):
+            _logger.warning(f"{record['name']}: only scalar numeric values are stored")
+            return False
+
+        history = self.get(record["name"])
+        return history.append(
+            float(record["timestamp"]),
+            value,
+            int(record.get("status", 0)),
+            int(record.get("severity", 0)),
+        )
+
+    def query(
+        self, pvname: str, start: float | None = None, end: float | None = None
+    ) -> np.ndarray:
+        history = self.get(pvname, create=False)
+        if history is None:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return history.query(start, end)
+
+    def flush(self) -> None:
+        for history in self.files.values():
+            history.flush()
+
+
+# stores shared by all nodes using the same directory
+_stores: dict[Path, HistoryStore] = {}
+
+
+def get_store(directory: Path) -> HistoryStore:
+    key = directory.resolve()
+    store = _stores.get(key)
+    if store is None:
+        store = HistoryStore(key)
+        _stores[key] = store
+        register_shutdown(close_stores)
+    return store
+
+
+async def close_stores() -> None:
+    while _stores:
+        _, store = _stores.popitem()
+        store.flush()
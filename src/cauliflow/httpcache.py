@@ -0,0 +1,129 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    out: Any
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+@dataclass
+class CacheEntry:
+    response: CachedResponse
+    expires: float
+
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    shared: int = 0
+    evicted: int = 0
+
+
+Fetch = Callable[[dict[str, str]], Awaitable[CachedResponse]]
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self.inflight: dict[Hashable, asyncio.Future] = {}
+        self.stats = ResponseCacheStats()
+
+    async def get(self, key: Hashable, ttl: float, fetch: Fetch) -> Any:
+        while True:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires > monotonic():
+                self.entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry.response.out
+
+            # concurrent identical requests wait for the request already in flight
+            inflight = self.inflight.get(key)
+            if inflight is None:
+                return await self._lead(key, entry, ttl, fetch)
+
+            self.stats.shared += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not inflight.cancelled() or (task and task.cancelling()):
+                    raise
+                # the caller of the request was cancelled, so the request
+                # is made again by one of the waiters
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    async def _lead(
+        self, key: Hashable, entry: CacheEntry | None, ttl: float, fetch: Fetch
+    ) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            out = await self._fetch(key, entry, ttl, fetch)
+        except asyncio.CancelledError:
+            # the cancellation of this caller is not passed to the waiters
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # the exception is raised here, not only to the waiters
+            future.exception()
+            raise
+        else:
+            future.set_result(out)
+            return out
+        finally:
+            del self.inflight[key]
+
+    async def _fetch(
+        self, key: Hashable, entry: CacheEntry | None, ttl: float, fetch: Fetch
+    ) -> Any:
+        headers = {}
+        if entry is not None:
+            if entry.response.etag is not None:
+                headers["If-None-Match"] = entry.response.etag
+            if entry.response.last_modified is not None:
+                headers["If-Modified-Since"] = entry.response.last_modified
+
+        response = await fetch(headers)
+
+        if response.status == 304 and entry is not None:
+            self.stats.revalidated += 1
+            entry.expires = monotonic() + ttl
+            self.entries.move_to_end(key)
+            return entry.response.out
+
+        self.stats.misses += 1
+        if 200 <= response.status < 300:
+            self._set(key, CacheEntry(response, monotonic() + ttl))
+        return response.out
+
+    def _set(self, key: Hashable, entry: CacheEntry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats.evicted += 1
+
+
+# cache shared by all http nodes
+_cache: ResponseCache | None = None
+
+
+def get_cache(max_entries: int = 256) -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(max_entries)
+    return _cache
@@ -0,0 +1,85 @@
+import json
+import math
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# name of the JSON backend in use
+BACKEND = "orjson" if orjson is not None else "json"
+
+BACKENDS = ("orjson", "json")
+
+
+def set_backend(name: str) -> None:
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"{name} is not valid JSON backend")
+    if name == "orjson" and orjson is None:
+        raise ValueError("orjson is not installed")
+    BACKEND = name
+
+
+def to_builtin(obj: Any) -> Any:
+    # Called for the objects which the JSON backend cannot serialize.
+    # Augmented CA values are subclasses of numpy arrays or builtin scalars.
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+    if isinstance(obj, bool):
+        return bool(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    if isinstance(obj, float):
+        return float(obj)
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(obj: Any) -> str:
+    if BACKEND == "orjson":
+        return orjson.dumps(
+            obj, default=to_builtin, option=orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+    try:
+        return json.dumps(
+            obj, default=to_builtin, separators=(",", ":"), allow_nan=False
+        )
+    except ValueError:
+        # NaN and Infinity are output as null like orjson
+        return json.dumps(
+            _replace_nonfinite(obj), default=to_builtin, separators=(",", ":")
+        )
+
+
+def _replace_nonfinite(obj: Any) -> Any:
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _replace_nonfinite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_nonfinite(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int)):
+        return obj
+    return _replace_nonfinite(to_builtin(obj))
+
+
+def loads(data: str | bytes) -> Any:
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
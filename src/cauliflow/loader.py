@@ -3,7 +3,7 @@ from logging import getLogger
 from pathlib import Path
 
 import yaml
-from cauliflow.context import ctx_macros
+from cauliflow.context import ctx_blackboard, ctx_macros
 from cauliflow.flow import ConcurrentFlows, Flow, Flows, SequentialFlows
 from cauliflow.macros import Macros
 
@@ -42,6 +42,10 @@ def flow_from_yaml(file_path: str | Path) -> Flows:
         mcr.update(yaml_dict["macros"])
         ctx_macros.set(mcr)
 
+    if "blackboard" in yaml_dict:
+        bb = ctx_blackboard.get()
+        bb.configure(**yaml_dict["blackboard"])
+
     return flows
 
 
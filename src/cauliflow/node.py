@@ -25,6 +25,7 @@ _logger = get_logger(__name__)
 COMMON_ARGUMENT_SPEC: dict[str, ArgSpec] = {
     "out_bb": ArgSpec(type="bool", required=False, default=False),
     "out_field": ArgSpec(type="str", required=False, default=None),
+    "out_ttl": ArgSpec(type="float", required=False, default=None),
 }
 
 COMMON_ARGUMENT_DOC = """
@@ -35,6 +36,10 @@ out_bb:
 out_field:
   description:
     - The key for the data in the blackboard. If out_bb is set to False, this parameter is ignored.
+out_ttl:
+  description:
+    - Time to live in seconds for the data in the blackboard. The data is removed after this period has passed.
+    - If this parameter is not set, the TTL configured for the blackboard is used. If out_bb is set to False, this parameter is ignored.
 """
 
 
@@ -97,10 +102,13 @@ class Node(ABC):
         param_out_field = self.params["out_field"]
         field = param_out_field if param_out_field else self.name
 
-        ctx = ctx_blackboard if self.params["out_bb"] else ctx_flowdata
+        if self.params["out_bb"]:
+            bb = ctx_blackboard.get()
+            bb.set(field, value, ttl=self.params["out_ttl"])
+            return
 
-        var = ctx.get()
-        var[field] = value
+        fd = ctx_flowdata.get()
+        fd[field] = value
 
     def _make_vars(
         self, argument_spec: dict[str, ArgSpec], param_dict: dict
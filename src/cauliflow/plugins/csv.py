@@ -1,12 +1,25 @@
+import asyncio
 import csv
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from enum import StrEnum
+from itertools import islice
 from pathlib import Path
+from typing import Any, TextIO
 
+from cauliflow.context import ctx_flowdata
+from cauliflow.flowdata import FlowData
 from cauliflow.logging import get_logger
 from cauliflow.node import ArgSpec, ProcessNode, node
 
 _logger = get_logger(__name__)
 
+_READ_SIZE = 1000
+
+# the maximum number of the parsed files kept in the cache
+_CACHE_SIZE = 16
+
 
 class DataFormat(StrEnum):
     ARRAY = "array"
@@ -14,6 +27,17 @@ class DataFormat(StrEnum):
     KEYVALUE = "key_value"
 
 
+@dataclass
+class CacheEntry:
+    signature: tuple[int, int]
+    data: dict | list
+
+
+# parsed results shared by all in_csv nodes, keyed by path and format
+# The least recently used entry is dropped when the cache is full.
+_cache: OrderedDict[tuple[str, str], CacheEntry] = OrderedDict()
+
+
 @node.register("in_csv")
 class InputCSVNode(ProcessNode):
     """
@@ -30,6 +54,25 @@ class InputCSVNode(ProcessNode):
           description:
             - Output format.
             - Choose array, dict or key_value.
+        stream:
+          description:
+            - If this parameter is set to True, the rows are read one after another and passed to the child node for each row.
+            - The whole file is not loaded into memory, and the child node is not run after all rows are passed.
+            - In key_value format, each row is output as a dict with a single key.
+        batch_size:
+          description:
+            - The number of rows passed to the child node at once in stream mode.
+            - The batch is output in the same format as the whole file is read.
+            - If this parameter is not set, each row is passed individually.
+        cache:
+          description:
+            - If this parameter is set to True, the parsed data is cached and reused while the modification time and the size of the file are not changed.
+            - The cache is shared by all in_csv nodes reading the same file in the same format. The cached data must not be modified.
+            - The cache is not used in stream mode.
+            - Up to 16 files are cached, and the least recently used one is dropped.
+        watch:
+          description:
+            - If this parameter is set to True, the file is read and the child node is run only when the file is changed since the last run.
     EXAMPLE: |-
       # Assume following csv file is located at "./file.csv"
       # id, name
@@ -57,38 +100,163 @@ class InputCSVNode(ProcessNode):
           name: "csv"
           path: "./file.csv"
           format: "array"
+
+      # Read the csv file row by row and print each row
+      # Output: {"csv": {'id': 'foo', 'name': 'John'}}, then {"csv": {'id': 'bar', 'name': 'Tom'}}
+      - in_csv:
+          name: "csv"
+          path: "./file.csv"
+          format: "dict"
+          stream: yes
+      - stdout:
+          name: "out"
+          src: "{{ fd.csv }}"
+
+      # Read the csv file in batches of 1000 rows
+      # Output: {"csv": [{'id': 'foo', 'name': 'John'}, {'id': 'bar', 'name': 'Tom'}]}
+      - in_csv:
+          name: "csv"
+          path: "./file.csv"
+          format: "dict"
+          stream: yes
+          batch_size: 1000
+
+      # Reload the csv file only when it is changed
+      - interval:
+          name: "interval"
+          interval: 10
+      - in_csv:
+          name: "csv"
+          path: "./file.csv"
+          format: "key_value"
+          watch: yes
+          out_bb: yes
     """
 
+    def __init__(self, name: str, param_dict: dict | None = None):
+        super().__init__(name, param_dict)
+        self.changed = True
+        self.watched_signature: tuple[int, int] | None = None
+
+    # redeclare run not to run a child node after all rows are streamed
+    # or when the file is not changed in watch mode
+    async def run(self) -> None:
+        await self._run_self()
+        if self.params["stream"] or not self.changed:
+            return
+        await self._run_child()
+
     def set_argument_spec(self) -> dict[str, ArgSpec]:
         self.set_common_output_args()
         return {
             "path": ArgSpec(type="path", required=True),
             "format": ArgSpec(type="str", required=False, default="key_value"),
+            "stream": ArgSpec(type="bool", required=False, default=False),
+            "batch_size": ArgSpec(type="int", required=False, default=None),
+            "cache": ArgSpec(type="bool", required=False, default=False),
+            "watch": ArgSpec(type="bool", required=False, default=False),
         }
 
     async def process(self) -> None:
-        path = self.params["path"]
+        path = Path(self.params["path"])
         format = self.params["format"]
 
-        csvdata = self.get_csvdata(Path(path), format)
+        if self.params["watch"]:
+            signature = _file_signature(path)
+            self.changed = signature != self.watched_signature
+            self.watched_signature = signature
+            if not self.changed:
+                return
+
+        if self.params["stream"]:
+            await self.stream_csvdata(path, format, self.params["batch_size"])
+            return
+
+        if self.params["cache"]:
+            csvdata = self.get_cached_csvdata(path, format)
+        else:
+            csvdata = self.get_csvdata(path, format)
         self.output(csvdata)
 
+    def get_cached_csvdata(
+        self, path: Path, format: str | DataFormat
+    ) -> dict | list | None:
+        # the signature is taken before reading so that a file modified
+        # during the read is parsed again next time
+        signature = _file_signature(path)
+        key = (str(path.resolve()), str(format))
+        entry = _cache.get(key)
+        if entry is not None and entry.signature == signature:
+            _cache.move_to_end(key)
+            return entry.data
+
+        _cache.pop(key, None)
+        csvdata = self.get_csvdata(path, format)
+        if csvdata is not None:
+            _cache[key] = CacheEntry(signature=signature, data=csvdata)
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+        return csvdata
+
     def get_csvdata(self, path: Path, format: str | DataFormat) -> dict | list | None:
+        if format not in list(DataFormat):
+            _logger.warning(f"format:{format} is not matched")
+            return None
+
         with path.open(newline="") as csvfile:
-            if format == DataFormat.DICT:
-                reader = csv.DictReader(csvfile, skipinitialspace=True)
-                dictlist = [row for row in reader]
-                return dictlist
-
-            reader = csv.reader(csvfile, skipinitialspace=True)
-            if format == DataFormat.ARRAY:
-                csvdata = [row for row in reader]
-                return csvdata
-
-            if format == DataFormat.KEYVALUE:
-                csvdata = {}
-                for row in reader:
-                    csvdata[row[0]] = row[1]
-                return csvdata
+            reader = _make_reader(csvfile, format)
+            return _to_batch(reader, format)
 
+    async def stream_csvdata(
+        self, path: Path, format: str | DataFormat, batch_size: int | None
+    ) -> None:
+        if format not in list(DataFormat):
             _logger.warning(f"format:{format} is not matched")
+            return
+
+        base_fd = ctx_flowdata.get()
+        read_size = batch_size if batch_size else _READ_SIZE
+
+        with path.open(newline="") as csvfile:
+            reader = _make_reader(csvfile, format)
+            # rows are read in a worker thread so that the event loop is not blocked
+            while rows := await asyncio.to_thread(_read_rows, reader, read_size):
+                if batch_size:
+                    await self._emit(base_fd, _to_batch(rows, format))
+                    continue
+                for row in rows:
+                    await self._emit(base_fd, _to_row(row, format))
+
+        ctx_flowdata.set(base_fd)
+
+    async def _emit(self, base_fd: FlowData, data: Any) -> None:
+        ctx_flowdata.set(base_fd.fork())
+        self.output(data)
+        await self._run_child()
+
+
+def _file_signature(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _make_reader(csvfile: TextIO, format: str | DataFormat) -> Iterator:
+    if format == DataFormat.DICT:
+        return csv.DictReader(csvfile, skipinitialspace=True)
+    return csv.reader(csvfile, skipinitialspace=True)
+
+
+def _read_rows(reader: Iterator, size: int) -> list:
+    return list(islice(reader, size))
+
+
+def _to_row(row: Any, format: str | DataFormat) -> Any:
+    if format == DataFormat.KEYVALUE:
+        return {row[0]: row[1]}
+    return row
+
+
+def _to_batch(rows: Iterable, format: str | DataFormat) -> dict | list:
+    if format == DataFormat.KEYVALUE:
+        return {row[0]: row[1] for row in rows}
+    return list(rows)
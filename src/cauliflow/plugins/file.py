@@ -1,8 +1,292 @@
+import asyncio
+import gzip
+import io
+import os
+from collections.abc import Callable
+from datetime import datetime
+from enum import StrEnum
 from pathlib import Path
+from time import monotonic
+from typing import Any, BinaryIO, TextIO
 
-import aiofiles
-
+from cauliflow import jsoncodec
+from cauliflow.logging import get_logger
 from cauliflow.node import ArgSpec, ProcessNode, node
+from cauliflow.shutdown import register_shutdown
+
+try:
+    from compression import zstd  # type: ignore
+except ImportError:
+    try:
+        from backports import zstd  # type: ignore
+    except ImportError:
+        zstd = None
+
+_logger = get_logger(__name__)
+
+
+class FsyncPolicy(StrEnum):
+    NEVER = "never"
+    FLUSH = "flush"
+    CLOSE = "close"
+
+
+class Compression(StrEnum):
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+class Serializer(StrEnum):
+    TEXT = "text"
+    JSON = "json"
+
+
+_COMPRESSION_SUFFIX = {
+    Compression.NONE: "",
+    Compression.GZIP: ".gz",
+    Compression.ZSTD: ".zst",
+}
+
+
+class BufferedWriter:
+    def __init__(
+        self,
+        path: Path,
+        buffer_size: int = 0,
+        flush_interval: float = 1.0,
+        fsync: str | FsyncPolicy = FsyncPolicy.NEVER,
+    ):
+        if fsync not in list(FsyncPolicy):
+            raise ValueError(f"{fsync} is not valid fsync policy")
+
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.buffer: list[str] = []
+        self.size = 0
+        self.file: TextIO | None = None
+        self.lock = asyncio.Lock()
+        self.timer_task: asyncio.Task | None = None
+        # the error of the flush by the timer is raised on the next call
+        self.error: Exception | None = None
+
+    async def write(self, text: str) -> None:
+        self._raise_error()
+        self.buffer.append(text)
+        self.size += len(text)
+
+        if self.size >= self.buffer_size:
+            await self.flush()
+        elif self.timer_task is None:
+            self.timer_task = asyncio.create_task(self._start_timer())
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self.buffer:
+                return
+            data = "".join(self.buffer)
+            self.buffer = []
+            self.size = 0
+            if self._writes_inline():
+                self._write(data)
+                return
+            # blocking file I/O runs in a worker thread once for the whole batch
+            await asyncio.to_thread(self._write, data)
+
+    async def close(self) -> None:
+        if self.timer_task is not None:
+            self.timer_task.cancel()
+            self.timer_task = None
+
+        await self.flush()
+
+        async with self.lock:
+            if self.file is not None:
+                await asyncio.to_thread(self._close)
+        self._raise_error()
+
+    async def _start_timer(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self.timer_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            _logger.exception(f"failed to flush {self.path}")
+            self.error = e
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _writes_inline(self) -> bool:
+        # a line of unbuffered data is written in place, which is cheaper than
+        # a round trip to a worker thread unless fsync is called for each write
+        return self.buffer_size == 0 and self.fsync != FsyncPolicy.FLUSH
+
+    def _open(self) -> TextIO:
+        return self.path.open(mode="a")
+
+    def _write(self, data: str) -> None:
+        if self.file is None:
+            self.file = self._open()
+        self.file.write(data)
+        self.file.flush()
+        if self.fsync == FsyncPolicy.FLUSH:
+            os.fsync(self.file.fileno())
+
+    def _close(self) -> None:
+        if self.file is None:
+            return
+        if self.fsync != FsyncPolicy.NEVER:
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+
+
+class RotatingWriter(BufferedWriter):
+    def __init__(
+        self,
+        path: Path,
+        compression: str | Compression = Compression.NONE,
+        rotate_size: int | None = None,
+        rotate_interval: float | None = None,
+        buffer_size: int = 0,
+        flush_interval: float = 1.0,
+        fsync: str | FsyncPolicy = FsyncPolicy.NEVER,
+    ):
+        super().__init__(path, buffer_size, flush_interval, fsync)
+        if compression not in list(Compression):
+            raise ValueError(f"{compression} is not valid compression")
+        if compression == Compression.ZSTD and zstd is None:
+            raise ValueError("zstd compression is not available")
+
+        self.compression = compression
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.raw: BinaryIO | None = None
+        self.segment_path: Path | None = None
+        self.segment_size = 0
+        self.segment_start = 0.0
+
+    def _writes_inline(self) -> bool:
+        # compression and rotation always run in a worker thread
+        return False
+
+    def _write(self, data: str) -> None:
+        if self.file is not None and self._should_rotate():
+            self._close()
+        super()._write(data)
+        self.segment_size += len(data)
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_size is not None and self.segment_size >= self.rotate_size:
+            return True
+        if self.rotate_interval is not None:
+            return monotonic() - self.segment_start >= self.rotate_interval
+        return False
+
+    def _open(self) -> TextIO:
+        self.segment_path = self._next_segment_path()
+        self.segment_size = 0
+        self.segment_start = monotonic()
+        self.raw = self.segment_path.open(mode="xb")
+
+        # the compressor streams into the raw file, which is kept separately
+        # so that fsync can be called after the compressed stream is finished
+        if self.compression == Compression.GZIP:
+            stream = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        elif self.compression == Compression.ZSTD:
+            stream = zstd.ZstdFile(self.raw, mode="w")  # type: ignore
+        else:
+            stream = self.raw
+        return io.TextIOWrapper(stream, encoding="utf-8")  # type: ignore
+
+    def _close(self) -> None:
+        if self.file is None or self.raw is None:
+            return
+        self.file.flush()
+        stream = self.file.detach()
+        if stream is not self.raw:
+            # finish the compressed stream without closing the raw file
+            stream.close()
+        self.raw.flush()
+        if self.fsync != FsyncPolicy.NEVER:
+            os.fsync(self.raw.fileno())
+        self.raw.close()
+        self.file = None
+        self.raw = None
+
+    def _next_segment_path(self) -> Path:
+        # the sequence number keeps the names sorted in the order of writing
+        # when segments are started in the same second
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        suffix = self.path.suffix + _COMPRESSION_SUFFIX[self.compression]
+        count = 0
+        while True:
+            name = f"{self.path.stem}.{timestamp}.{count:04d}{suffix}"
+            path = self.path.with_name(name)
+            if not path.exists():
+                return path
+            count += 1
+
+
+# writers shared by all nodes writing to the same path
+_writers: dict[Path, BufferedWriter] = {}
+
+
+def _get_shared_writer(
+    path: Path, create: Callable[[Path], BufferedWriter]
+) -> BufferedWriter:
+    key = path.resolve()
+    writer = _writers.get(key)
+    if writer is None:
+        writer = create(key)
+        _writers[key] = writer
+        register_shutdown(close_writers)
+    return writer
+
+
+def get_writer(
+    path: Path,
+    buffer_size: int = 0,
+    flush_interval: float = 1.0,
+    fsync: str | FsyncPolicy = FsyncPolicy.NEVER,
+) -> BufferedWriter:
+    return _get_shared_writer(
+        path, lambda key: BufferedWriter(key, buffer_size, flush_interval, fsync)
+    )
+
+
+def get_rotating_writer(
+    path: Path,
+    compression: str | Compression = Compression.NONE,
+    rotate_size: int | None = None,
+    rotate_interval: float | None = None,
+    buffer_size: int = 0,
+    flush_interval: float = 1.0,
+    fsync: str | FsyncPolicy = FsyncPolicy.NEVER,
+) -> BufferedWriter:
+    return _get_shared_writer(
+        path,
+        lambda key: RotatingWriter(
+            key,
+            compression,
+            rotate_size,
+            rotate_interval,
+            buffer_size,
+            flush_interval,
+            fsync,
+        ),
+    )
+
+
+async def close_writers() -> None:
+    while _writers:
+        _, writer = _writers.popitem()
+        await writer.close()
 
 
 @node.register("out_file")
@@ -12,6 +296,9 @@ class OutFileNode(ProcessNode):
       short_description: Output the data to the file.
       description:
         - Output the data to the file.
+        - The file is kept open and shared by all out_file nodes writing to the same path.
+          The settings of the first node are used for the shared file.
+        - The file is closed when the flows are finished.
       parameters:
         path:
           description:
@@ -19,6 +306,19 @@ class OutFileNode(ProcessNode):
         src:
           description:
             - Data to output.
+        buffer_size:
+          description:
+            - The number of characters to be buffered in memory before writing to the file.
+            - If this parameter is 0, the data is written to the file for each execution without a worker thread.
+        flush_interval:
+          description:
+            - The maximum time in second for the data to stay in the buffer.
+        fsync:
+          description:
+            - Durability policy. Choose never, flush or close.
+            - In never mode, the data is written to the OS but fsync is not called.
+            - In flush mode, fsync is called each time the buffer is written to the file.
+            - In close mode, fsync is called when the file is closed.
     EXAMPLE: |-
       # Output hello to test.txt
       - out_file:
@@ -31,16 +331,190 @@ class OutFileNode(ProcessNode):
           name: "out"
           path: "./test.txt"
           src: "{{ bb.csv }}"
+
+      # Buffer up to 64 KiB or 5 seconds of data before writing to test.txt
+      - out_file:
+          name: "out"
+          path: "./test.txt"
+          src: "{{ fd.line }}"
+          buffer_size: 65536
+          flush_interval: 5.0
     """
 
     def set_argument_spec(self) -> dict[str, ArgSpec]:
         return {
             "path": ArgSpec(type="path", required=True),
             "src": ArgSpec(type="str", required=True),
+            "buffer_size": ArgSpec(type="int", required=False, default=0),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+            "fsync": ArgSpec(type="str", required=False, default=FsyncPolicy.NEVER),
+        }
+
+    async def process(self) -> None:
+        writer = get_writer(
+            Path(self.params["path"]),
+            buffer_size=self.params["buffer_size"],
+            flush_interval=self.params["flush_interval"],
+            fsync=self.params["fsync"],
+        )
+        await writer.write(self.params["src"] + "\n")
+
+
+@node.register("out_file_rotating")
+class OutFileRotatingNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Output the data to rotated and compressed files.
+      description:
+        - Output the data to rotated and compressed files.
+        - The data is written to segment files named <stem>.<timestamp>.<sequence><suffix> next to the path, for example archive.20250101-000000.0000.jsonl.gz.
+        - The names of the segment files are sorted in the order they are written.
+        - A new segment file is started when the segment exceeds the size or the time limit.
+        - The data is compressed while it is written, in a worker thread off the event loop.
+        - The files are shared by all nodes writing to the same path, and closed when the flows are finished.
+      parameters:
+        path:
+          description:
+            - The base path of the files to output.
+        src:
+          description:
+            - Data to output.
+        serializer:
+          description:
+            - Serializer of the data. Choose text or json.
+            - In text mode, the data is converted into a string and written as a line.
+            - In json mode, the data is written as a line of JSON (JSON lines).
+        compression:
+          description:
+            - Compression of the files. Choose none, gzip or zstd.
+            - zstd is available with Python 3.14 or the backports.zstd package.
+        rotate_size:
+          description:
+            - The size of the uncompressed data in characters to start a new segment file.
+        rotate_interval:
+          description:
+            - The time in second to start a new segment file.
+        buffer_size:
+          description:
+            - The number of characters to be buffered in memory before writing to the file.
+        flush_interval:
+          description:
+            - The maximum time in second for the data to stay in the buffer.
+        fsync:
+          description:
+            - Durability policy. Choose never, flush or close.
+    EXAMPLE: |-
+      # Archive the PV data as gzip compressed JSON lines and rotate the file every hour
+      - camonitor:
+          name: "camonitor"
+          pvname: ["TEST:PV1", "TEST:PV2"]
+      - out_file_rotating:
+          name: "archive"
+          path: "./archive.jsonl"
+          src: "{{ fd.camonitor }}"
+          serializer: "json"
+          compression: "gzip"
+          rotate_interval: 3600
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "path": ArgSpec(type="path", required=True),
+            "src": ArgSpec(type="any", required=True),
+            "serializer": ArgSpec(type="str", required=False, default=Serializer.TEXT),
+            "compression": ArgSpec(
+                type="str", required=False, default=Compression.GZIP
+            ),
+            "rotate_size": ArgSpec(type="int", required=False, default=None),
+            "rotate_interval": ArgSpec(type="float", required=False, default=None),
+            "buffer_size": ArgSpec(type="int", required=False, default=65536),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+            "fsync": ArgSpec(type="str", required=False, default=FsyncPolicy.NEVER),
+        }
+
+    async def process(self) -> None:
+        writer = get_rotating_writer(
+            Path(self.params["path"]),
+            compression=self.params["compression"],
+            rotate_size=self.params["rotate_size"],
+            rotate_interval=self.params["rotate_interval"],
+            buffer_size=self.params["buffer_size"],
+            flush_interval=self.params["flush_interval"],
+            fsync=self.params["fsync"],
+        )
+        line = serialize(self.params["src"], self.params["serializer"])
+        await writer.write(line + "\n")
+
+
+def serialize(data: Any, serializer: str | Serializer) -> str:
+    if serializer == Serializer.TEXT:
+        return str(data)
+    if serializer == Serializer.JSON:
+        return jsoncodec.dumps(data)
+    raise ValueError(f"{serializer} is not valid serializer")
+
+
+@node.register("out_jsonl")
+class OutJsonlNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Output the data to a file as JSON lines.
+      description:
+        - Output the data to a file as JSON lines.
+        - Dicts, lists and PV records of caget and camonitor are serialized directly without building a string.
+        - NumPy arrays and augmented CA values are converted into JSON values.
+        - orjson is used as the JSON encoder if it is installed.
+        - The lines are buffered and written to the file in batches.
+      parameters:
+        path:
+          description:
+            - The path of the file to output.
+        src:
+          description:
+            - Data to output.
+        split:
+          description:
+            - If true and src is a list, each item of the list is written as a line.
+        buffer_size:
+          description:
+            - The number of characters to be buffered in memory before writing to the file.
+        flush_interval:
+          description:
+            - The maximum time in second for the data to stay in the buffer.
+        fsync:
+          description:
+            - Durability policy. Choose never, flush or close.
+    EXAMPLE: |-
+      # Output the PV records to pv.jsonl
+      # {"name":"TEST:PV1","value":7.0,"timestamp":1749196716.822903,"status":0,"severity":0,"ok":true}
+      # {"name":"TEST:PV2","value":8.0,"timestamp":1749196717.822903,"status":0,"severity":0,"ok":true}
+      - caget:
+          name: "caget"
+          pvname: ["TEST:PV1", "TEST:PV2"]
+      - out_jsonl:
+          name: "out"
+          path: "./pv.jsonl"
+          src: "{{ fd.caget }}"
+          split: true
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "path": ArgSpec(type="path", required=True),
+            "src": ArgSpec(type="any", required=True),
+            "split": ArgSpec(type="bool", required=False, default=False),
+            "buffer_size": ArgSpec(type="int", required=False, default=65536),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+            "fsync": ArgSpec(type="str", required=False, default=FsyncPolicy.NEVER),
         }
 
     async def process(self) -> None:
-        path = Path(self.params["path"])
+        writer = get_writer(
+            Path(self.params["path"]),
+            buffer_size=self.params["buffer_size"],
+            flush_interval=self.params["flush_interval"],
+            fsync=self.params["fsync"],
+        )
         src = self.params["src"]
-        async with aiofiles.open(path, mode="a") as f:
-            await f.write(src + "\n")
+        records = src if self.params["split"] and isinstance(src, list) else [src]
+        await writer.write("".join(jsoncodec.dumps(r) + "\n" for r in records))
@@ -1,9 +1,11 @@
 import asyncio
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator
 from enum import StrEnum
-from typing import TypedDict
+from functools import partial
+from itertools import islice
+from typing import Any, TypedDict
 
-from cauliflow.context import ctx_flowdata, init_flowdata
+from cauliflow.context import ctx_flowdata
 from cauliflow.flowdata import FlowData
 from cauliflow.logging import get_logger
 from cauliflow.node import ArgSpec, FlowControlNode, Node, node
@@ -123,6 +125,11 @@ class ForEachMode(StrEnum):
     CONCURRENT = "concurrent"
 
 
+class CollectFormat(StrEnum):
+    LIST = "list"
+    DICT = "dict"
+
+
 @node.register("foreach")
 class ForEachNode(FlowControlNode):
     """
@@ -146,6 +153,31 @@ class ForEachNode(FlowControlNode):
         child_for:
           description:
             - Child node to be run for each item.
+        max_concurrency:
+          description:
+            - The maximum number of items processed at the same time in concurrent mode.
+            - A fixed number of workers process the items one after another.
+            - If this parameter is not set, all items are processed at the same time.
+        chunk_size:
+          description:
+            - The number of items in a chunk in concurrent mode.
+            - The items are split into chunks, and the next chunk is started after all items in the previous chunk are finished.
+            - If this parameter is not set, all items are processed as a single chunk.
+        timeout:
+          description:
+            - Timeout in second for the flow of child_for for each item.
+            - If the timeout expires, the flow for the item is cancelled and the next item is processed.
+        collect:
+          description:
+            - A key or a list of keys in the flowdata to be collected from the flow of child_for for each item.
+            - The collected data is output after all items are processed.
+            - If a list of keys is set, the collected data of each item is a dict of the keys.
+            - The data is None for the item whose key is not found or whose flow is timed out.
+        collect_format:
+          description:
+            - Output format of the collected data. Choose list or dict.
+            - In list format, the collected data is ordered as same as items.
+            - In dict format, the collected data is keyed by the item.
     EXAMPLE: |-
       # Print 1, 2, 3, and hello into the stdout
       # Output: No output
@@ -162,6 +194,37 @@ class ForEachNode(FlowControlNode):
           name: "out"
           src: "hello"
           parent: "for"
+
+      # Get PVs with up to 10 concurrent caget in chunks of 1000 PVs
+      # Output: No output
+      - foreach:
+          name: "for"
+          items: "{{ fd.pvnames }}"
+          item_name: "pvname"
+          mode: "concurrent"
+          max_concurrency: 10
+          chunk_size: 1000
+          timeout: 5.0
+      - caget:
+          name: "caget"
+          pvname: "{{ fd.pvname }}"
+          parent: "for.child_for"
+
+      # Collect the results of caget for each PV
+      # Output: {"for": {"TEST:PV1": 1.0, "TEST:PV2": 2.0}}
+      - foreach:
+          name: "for"
+          items: ["TEST:PV1", "TEST:PV2"]
+          item_name: "pvname"
+          collect: "value"
+          collect_format: "dict"
+      - caget:
+          name: "caget"
+          pvname: "{{ fd.pvname }}"
+          parent: "for.child_for"
+      - message:
+          name: "value"
+          msg: "{{ fd.caget.value }}"
     """
 
     def __init__(self, name: str, param_dict: dict | None = None):
@@ -169,11 +232,19 @@ class ForEachNode(FlowControlNode):
         self.child_for: Node | None = None
 
     def set_argument_spec(self) -> dict[str, ArgSpec]:
+        self.set_common_output_args()
         return {
             "mode": ArgSpec(type="str", required=False, default=ForEachMode.CONCURRENT),
             "items": ArgSpec(type="list", required=True),
             "item_name": ArgSpec(type="str", required=False, default="item"),
             "child_for": ArgSpec(type="node", required=False, default=None),
+            "max_concurrency": ArgSpec(type="int", required=False, default=None),
+            "chunk_size": ArgSpec(type="int", required=False, default=None),
+            "timeout": ArgSpec(type="float", required=False, default=None),
+            "collect": ArgSpec(type="str|list[str]", required=False, default=None),
+            "collect_format": ArgSpec(
+                type="str", required=False, default=CollectFormat.LIST
+            ),
         }
 
     async def process(self) -> None:
@@ -184,20 +255,41 @@ class ForEachNode(FlowControlNode):
         if not isinstance(items, Iterable):
             raise ValueError("items is not Iterable")
 
+        items = list(items)
         mode = self.params["mode"]
-        item_name = self.params["item_name"]
+        collect = self.params["collect"]
 
         base_fd = ctx_flowdata.get()
 
+        # slots are allocated in the order of items so that concurrent runs keep the order
+        results = [None] * len(items) if collect is not None else None
+        run_item = partial(
+            self._run_item,
+            base_fd,
+            self.params["item_name"],
+            self.child_for,
+            self.params["timeout"],
+            collect,
+            results,
+        )
+
         if mode == ForEachMode.SEQUENTIAL:
-            await self._sequential(base_fd, items, item_name, self.child_for)
+            await self._sequential(items, run_item)
         elif mode == ForEachMode.CONCURRENT:
-            await self._concurrent(base_fd, items, item_name, self.child_for)
+            await self._concurrent(
+                items,
+                run_item,
+                self.params["max_concurrency"],
+                self.params["chunk_size"],
+            )
         else:
             raise ValueError(f"{mode} is not valid mode")
 
         ctx_flowdata.set(base_fd)
 
+        if results is not None:
+            self.output(self._collected(items, results))
+
     def add_child(self, child: Node, param: str | None = None) -> None:
         if param is None:
             self.child = child
@@ -208,22 +300,78 @@ class ForEachNode(FlowControlNode):
 
         self.child_for = child
 
-    async def _sequential(self, base_fd, items, item_name, child: Node):
-        for item in items:
-            init_flowdata()
-            fd = ctx_flowdata.get()
-            fd.update(base_fd)
-            fd[item_name] = item
-            await child.run()
+    async def _sequential(self, items: list, run_item: Callable):
+        for index, item in enumerate(items):
+            await run_item(index, item)
+
+    async def _concurrent(
+        self,
+        items: list,
+        run_item: Callable,
+        max_concurrency: int | None,
+        chunk_size: int | None,
+    ):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least one")
+
+        for chunk in _chunked(enumerate(items), chunk_size):
+            num_workers = len(chunk)
+            if max_concurrency is not None:
+                num_workers = min(max_concurrency, num_workers)
+
+            # workers share the iterator and take the next item when they finish one
+            chunk_iter = iter(chunk)
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(num_workers):
+                    tg.create_task(self._worker(chunk_iter, run_item))
+
+    async def _worker(self, items: Iterator, run_item: Callable):
+        for index, item in items:
+            await run_item(index, item)
+
+    async def _run_item(
+        self,
+        base_fd: FlowData,
+        item_name: str,
+        child: Node,
+        timeout: float | None,
+        collect: str | list[str] | None,
+        results: list | None,
+        index: int,
+        item: Any,
+    ):
+        fd = base_fd.fork()
+        fd[item_name] = item
+        ctx_flowdata.set(fd)
+
+        cm = asyncio.timeout(timeout)
+        try:
+            async with cm:
+                await child.run()
+        except TimeoutError:
+            # TimeoutError raised by the child itself is not the timeout of the item
+            if not cm.expired():
+                raise
+            _logger.warning(f"child_for timed out for the item: {item}")
+            return
 
-    async def _concurrent(self, base_fd, items, item_name, child: Node):
-        async with asyncio.TaskGroup() as tg:
-            for item in items:
-                init_flowdata()
-                fd = ctx_flowdata.get()
-                fd.update(base_fd)
-                fd[item_name] = item
-                tg.create_task(child.run())
+        if results is None:
+            return
+
+        # child nodes may replace the flowdata, so get it again after the run
+        fd = ctx_flowdata.get()
+        if isinstance(collect, str):
+            results[index] = fd.get(collect)
+        else:
+            results[index] = {key: fd.get(key) for key in collect}  # type: ignore
+
+    def _collected(self, items: list, results: list) -> list | dict:
+        collect_format = self.params["collect_format"]
+        if collect_format == CollectFormat.LIST:
+            return results
+        if collect_format == CollectFormat.DICT:
+            return dict(zip(items, results))
+        raise ValueError(f"{collect_format} is not valid collect_format")
 
 
 @node.register("dispatch")
@@ -332,12 +480,26 @@ class DispatchNode(FlowControlNode):
         fds = []
         async with asyncio.TaskGroup() as tg:
             for target in targets:
-                init_flowdata()
-                fd = ctx_flowdata.get()
+                fd = base_fd.fork()
                 fds.append(fd)
-                fd.update(base_fd)
+                ctx_flowdata.set(fd)
                 tg.create_task(target.run())
-        ret = {}
+
+        # only the keys added by the targets are merged on top of base_fd
+        ret = base_fd.fork()
         for fd in fds:
-            ret.update(fd)
-        return FlowData(ret)
+            ret.data.update(fd.data)
+        return ret
+
+
+def _chunked(items: Iterable, size: int | None) -> Iterator[list]:
+    if size is None:
+        yield list(items)
+        return
+
+    if size < 1:
+        raise ValueError("chunk_size must be at least one")
+
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+from cauliflow.history import get_store
+from cauliflow.logging import get_logger
+from cauliflow.node import ArgSpec, ProcessNode, node
+
+_logger = get_logger(__name__)
+
+
+@node.register("out_history")
+class OutHistoryNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Store PV records to the local history store.
+      description:
+        - Store PV records of camonitor or caget to the local history store.
+        - The history store is a directory containing an append-only and memory-mapped file for each PV.
+        - Each record of the file has timestamp, value, status and severity.
+        - Only scalar numeric values are stored. The records which are not connected or older than the last record are skipped.
+      parameters:
+        directory:
+          description:
+            - The directory of the history store.
+        src:
+          description:
+            - A PV record or a list of PV records to store.
+    EXAMPLE: |-
+      # Store the PV data to ./history
+      - camonitor:
+          name: "camonitor"
+          pvname: ["TEST:PV1", "TEST:PV2"]
+      - out_history:
+          name: "history"
+          directory: "./history"
+          src: "{{ fd.camonitor }}"
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "directory": ArgSpec(type="path", required=True),
+            "src": ArgSpec(type="any", required=True),
+        }
+
+    async def process(self) -> None:
+        store = get_store(Path(self.params["directory"]))
+        src = self.params["src"]
+        records = src if isinstance(src, list) else [src]
+        for record in records:
+            if not store.append(record):
+                _logger.debug(f"{self.name}: record is skipped: {record}")
+
+
+@node.register("in_history")
+class InHistoryNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Read PV history from the local history store.
+      description:
+        - Read PV history in a time range from the local history store.
+        - The history of a PV is output as a dict of NumPy arrays with keys timestamp, value, status and severity.
+        - The arrays are views of the memory-mapped file and are not copied.
+        - If pvname is a list, a dict with PV names as keys is output.
+      parameters:
+        directory:
+          description:
+            - The directory of the history store.
+        pvname:
+          description:
+            - PV name or list of PV names to read.
+        start:
+          description:
+            - The start of the time range in UNIX time. The start is included.
+            - If not set, the history is read from the first record.
+        end:
+          description:
+            - The end of the time range in UNIX time. The end is included.
+            - If not set, the history is read until the last record.
+    EXAMPLE: |-
+      # Read the history of TEST:PV1 in 10 minutes
+      - in_history:
+          name: "history"
+          directory: "./history"
+          pvname: "TEST:PV1"
+          start: 1749196200.0
+          end: 1749196800.0
+      # Output: {'timestamp': array([...]), 'value': array([...]), 'status': array([...]), 'severity': array([...])}
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        self.set_common_output_args()
+        return {
+            "directory": ArgSpec(type="path", required=True),
+            "pvname": ArgSpec(type="any", required=True),
+            "start": ArgSpec(type="float", required=False, default=None),
+            "end": ArgSpec(type="float", required=False, default=None),
+        }
+
+    async def process(self) -> None:
+        store = get_store(Path(self.params["directory"]))
+        pvname = self.params["pvname"]
+        start = self.params["start"]
+        end = self.params["end"]
+
+        if isinstance(pvname, str):
+            self.output(_to_columns(store.query(pvname, start, end)))
+            return
+
+        self.output(
+            {name: _to_columns(store.query(name, start, end)) for name in pvname}
+        )
+
+
+def _to_columns(records) -> dict:
+    return {name: records[name] for name in records.dtype.names}
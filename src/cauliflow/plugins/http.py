@@ -1,15 +1,43 @@
 import asyncio
+import gzip
+import random
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import asdict, dataclass
 from enum import StrEnum
+from functools import partial
+from time import monotonic, perf_counter
 from typing import Any, TypedDict
 
-from aiohttp import ClientResponse, ClientSession, ClientTimeout
+from aiohttp import (
+    ClientError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+    StreamReader,
+    web,
+)
 
-from cauliflow.node import ArgSpec, ProcessNode, node
+from cauliflow import jsoncodec
+from cauliflow.context import ctx_flowdata, init_flowdata
+from cauliflow.httpcache import CachedResponse, get_cache
+from cauliflow.logging import get_logger
+from cauliflow.node import ArgSpec, ProcessNode, TriggerNode, node
+from cauliflow.session import SessionOptions, get_session
+from cauliflow.shutdown import register_shutdown
+
+_logger = get_logger(__name__)
+
+# marks the end of the stream in the queue of http_stream
+_END = object()
+
+# JSON bodies larger than this are decoded in a worker thread
+_THREAD_DECODE_SIZE = 262144
 
 
 class ResDataFormat(StrEnum):
     JSON = "json"
     TEXT = "text"
+    RAW = "raw"
 
 
 class MethodType(StrEnum):
@@ -20,11 +48,49 @@ class MethodType(StrEnum):
     DELETE = "delete"
 
 
+class StreamFormat(StrEnum):
+    NDJSON = "ndjson"
+    SSE = "sse"
+
+
+@dataclass
+class ListenStats:
+    requests: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    errors: int = 0
+    inflight: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+
+class BulkFormat(StrEnum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+
+@dataclass
+class BulkStats:
+    batches: int = 0
+    events: int = 0
+    failed: int = 0
+    # the number of the leading batches which have all completed
+    acked: int = 0
+
+
 class SuccessOut(TypedDict):
     status: int
     data: Any
 
 
+class FanoutOut(TypedDict, total=False):
+    url: str
+    status: int
+    data: Any
+    error: str
+    elapsed: float
+
+
 @node.register("http")
 class HTTPNode(ProcessNode):
     """
@@ -32,6 +98,7 @@ class HTTPNode(ProcessNode):
       short_description: Send a request to a HTTP endpoint.
       description:
           - Send a request to a HTTP endpoint.
+          - The connections are pooled and kept alive in a session shared by all http nodes for the same origin and pool settings.
       parameters:
         url:
           description:
@@ -47,7 +114,38 @@ class HTTPNode(ProcessNode):
             - Request body. This parameter is used for PUT, POST, and PATCH method.
         format:
           description:
-            - Data format to decode a response body. It can be either text or json.
+            - Data format to decode a response body. It can be text, json or raw.
+            - In json mode, the body is decoded with orjson if it is installed. A large body is decoded in a worker thread off the event loop.
+            - In raw mode, the body is output as bytes without decoding.
+        json_path:
+          description:
+            - Dot-separated path of the value to extract from the JSON body, for example result.items.0.
+            - Only the extracted value is output. If the path is not found, data is null.
+        cache:
+          description:
+            - If true, successful responses of GET requests are cached by URL, body, format and json_path.
+            - Only GET requests can be cached, because the other methods have side effects.
+            - The cache is shared by all http nodes. Concurrent identical requests share one request.
+            - An expired response is revalidated with ETag or Last-Modified of the response, and reused if the server returns 304.
+        cache_ttl:
+          description:
+            - Time in second for a cached response to be used without revalidation.
+        cache_size:
+          description:
+            - The maximum number of the cached responses. The least recently used response is discarded first.
+            - The value of the first node using the cache is used.
+        pool_limit:
+          description:
+            - The maximum number of simultaneous connections of the shared session.
+        pool_limit_per_host:
+          description:
+            - The maximum number of simultaneous connections to the same host. 0 means no limit.
+        dns_cache_ttl:
+          description:
+            - Time in second to cache DNS lookups. If null, DNS lookups are not cached.
+        keepalive_timeout:
+          description:
+            - Time in second to keep an idle connection alive.
     EXAMPLE: |-
       # Get with json format
       # Output: {"http": {"data": {"foo": "bar"}, "status": 200}}
@@ -63,6 +161,14 @@ class HTTPNode(ProcessNode):
           url: "http://example.com/api/data"
           format: "json"
 
+      # Get only the items of the result
+      # Output: {"http": {"data": [{"name": "foo"}], "status": 200}}
+      - http:
+          name: "http"
+          url: "http://example.com/api/data"
+          format: "json"
+          json_path: "result.items"
+
       # Timeout Error
       # Output: {"http": '{"error": "TimeoutError"}'}
       - http:
@@ -70,28 +176,50 @@ class HTTPNode(ProcessNode):
           url: "http://example.com/api/data"
           format: "json"
           timeout: "1"
+
+      # Get reference data at most once a minute
+      - http:
+          name: "http"
+          url: "http://example.com/api/config"
+          format: "json"
+          cache: true
+          cache_ttl: 60
     """
 
     async def process(self) -> None:
         timeout = ClientTimeout(total=self.params["timeout"])
+        session = get_session(self.params["url"], _session_options(self.params))
         method = self.params["method"]
+        url = self.params["url"]
+        body = self.params["body"]
+        format = self.params["format"]
+        json_path = self.params["json_path"]
+
+        if self.params["cache"] and method != MethodType.GET:
+            raise ValueError(f"cache is not supported for {method} method")
 
         try:
-            async with ClientSession(timeout=timeout) as session:
-                match method:
-                    case MethodType.GET:
-                        out = await self._get(session)
-                    case MethodType.PUT:
-                        out = await self._put(session)
-                    case MethodType.POST:
-                        out = await self._post(session)
-                    case MethodType.PATCH:
-                        out = await self._patch(session)
-                    case MethodType.DELETE:
-                        out = await self._delete(session)
-                    case _:
-                        out = {"error": "Illegal HTTP method"}
-                self.output(out)
+            if self.params["cache"]:
+                cache = get_cache(self.params["cache_size"])
+                out = await cache.get(
+                    (method, url, body, format, json_path),
+                    self.params["cache_ttl"],
+                    partial(
+                        _fetch,
+                        session,
+                        method,
+                        url,
+                        body,
+                        timeout,
+                        format,
+                        json_path=json_path,
+                    ),
+                )
+            else:
+                out = await _send(
+                    session, method, url, body, timeout, format, json_path=json_path
+                )
+            self.output(out)
         except asyncio.TimeoutError:
             out = {"error": "TimeoutError"}
             self.output(out)
@@ -104,42 +232,889 @@ class HTTPNode(ProcessNode):
             "timeout": ArgSpec(type="float", required=False, default=10),
             "method": ArgSpec(type="str", required=False, default="get"),
             "body": ArgSpec(type="str", required=False, default=""),
+            "json_path": ArgSpec(type="str", required=False, default=None),
+            "cache": ArgSpec(type="bool", required=False, default=False),
+            "cache_ttl": ArgSpec(type="float", required=False, default=60.0),
+            "cache_size": ArgSpec(type="int", required=False, default=256),
+            **_pool_argument_spec(),
         }
 
-    async def _get(self, session: ClientSession) -> SuccessOut:
-        async with session.get(self.params["url"]) as resp:
-            out = await self._get_output(resp)
 
-        return out
+@node.register("http_fanout")
+class HTTPFanoutNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Send requests to HTTP endpoints concurrently.
+      description:
+          - Send requests to HTTP endpoints concurrently and output the results in the order of the requests.
+          - Each result has url, status, data and elapsed time in second. If the request fails, the result has error instead of status and data.
+          - The number of the requests in flight is limited by max_concurrency.
+          - The requests are sent over the pooled sessions shared with http nodes.
+      parameters:
+        requests:
+          description:
+            - List of requests. Each request is a URL or a dict with url, method and body.
+            - Method and body which are not set in the dict are taken from the parameters of this node.
+        method:
+          description:
+            - "Default HTTP method. Following methods are available: get, put, post, patch, and delete."
+        body:
+          description:
+            - Default request body. This parameter is used for PUT, POST, and PATCH method.
+        timeout:
+          description:
+            - Timeout of each request in second.
+        format:
+          description:
+            - Data format to decode response bodies. It can be text, json or raw.
+            - In raw mode, the bodies are output as bytes without decoding.
+        max_concurrency:
+          description:
+            - The maximum number of the requests in flight.
+        pool_limit:
+          description:
+            - The maximum number of simultaneous connections of the shared session.
+        pool_limit_per_host:
+          description:
+            - The maximum number of simultaneous connections to the same host. 0 means no limit.
+        dns_cache_ttl:
+          description:
+            - Time in second to cache DNS lookups. If null, DNS lookups are not cached.
+        keepalive_timeout:
+          description:
+            - Time in second to keep an idle connection alive.
+    EXAMPLE: |-
+      # Get data from the endpoints, 20 requests at a time
+      # Output: {"http": [{"url": "http://example.com/api/1", "status": 200, "data": {"foo": "bar"}, "elapsed": 0.012}, ...]}
+      - http_fanout:
+          name: "http"
+          requests: "{{ bb.urls }}"
+          format: "json"
+          max_concurrency: 20
 
-    async def _put(self, session: ClientSession) -> SuccessOut:
-        async with session.put(self.params["url"], data=self.params["body"]) as resp:
-            out = await self._get_output(resp)
+      # Post different bodies to the endpoint
+      - http_fanout:
+          name: "http"
+          method: "post"
+          requests:
+            - {"url": "http://example.com/api/data", "body": "foo"}
+            - {"url": "http://example.com/api/data", "body": "bar"}
+    """
 
-        return out
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        self.set_common_output_args()
+        return {
+            "requests": ArgSpec(type="list", required=True),
+            "format": ArgSpec(type="str", required=False, default="text"),
+            "timeout": ArgSpec(type="float", required=False, default=10),
+            "method": ArgSpec(type="str", required=False, default="get"),
+            "body": ArgSpec(type="str", required=False, default=""),
+            "max_concurrency": ArgSpec(type="int", required=False, default=10),
+            **_pool_argument_spec(),
+        }
 
-    async def _post(self, session: ClientSession) -> SuccessOut:
-        async with session.post(self.params["url"], data=self.params["body"]) as resp:
-            out = await self._get_output(resp)
+    async def process(self) -> None:
+        requests = [self._to_spec(r) for r in self.params["requests"]]
+        results: list[FanoutOut] = [{} for _ in requests]  # type: ignore
+        num_workers = min(max(self.params["max_concurrency"], 1), len(requests))
 
-        return out
+        # workers share the iterator and take the next request when they finish one
+        request_iter = iter(enumerate(requests))
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(num_workers):
+                tg.create_task(self._worker(request_iter, results))
 
-    async def _patch(self, session: ClientSession) -> SuccessOut:
-        async with session.patch(self.params["url"], data=self.params["body"]) as resp:
-            out = await self._get_output(resp)
+        self.output(results)
 
-        return out
+    async def _worker(self, requests: Iterator, results: list[FanoutOut]) -> None:
+        timeout = ClientTimeout(total=self.params["timeout"])
+        options = _session_options(self.params)
+        for index, spec in requests:
+            results[index] = await self._request(spec, timeout, options)
 
-    async def _delete(self, session: ClientSession) -> SuccessOut:
-        async with session.delete(self.params["url"]) as resp:
-            out = await self._get_output(resp)
+    async def _request(
+        self, spec: dict, timeout: ClientTimeout, options: SessionOptions
+    ) -> FanoutOut:
+        url = spec["url"]
+        start = perf_counter()
+        try:
+            session = get_session(url, options)
+            out = await _send(
+                session,
+                spec["method"],
+                url,
+                spec["body"],
+                timeout,
+                self.params["format"],
+            )
+        except TimeoutError:
+            out = {"error": "TimeoutError"}
+        except (ClientError, ValueError) as e:
+            # ValueError is raised when the body cannot be decoded
+            out = {"error": f"{type(e).__name__}: {e}"}
+        return {"url": url, **out, "elapsed": perf_counter() - start}  # type: ignore
 
-        return out
+    def _to_spec(self, request: str | dict) -> dict:
+        if isinstance(request, str):
+            request = {"url": request}
+        return {
+            "url": request["url"],
+            "method": request.get("method", self.params["method"]),
+            "body": request.get("body", self.params["body"]),
+        }
 
-    async def _get_output(self, resp: ClientResponse) -> SuccessOut:
-        if self.params["format"] == ResDataFormat.JSON:
-            data = await resp.json()
+
+@node.register("http_stream")
+class HTTPStreamNode(TriggerNode):
+    """
+    DOCUMENTATION:
+      short_description: Receive events from a HTTP stream and pass them to flowdata.
+      description:
+        - Keep a connection to a HTTP endpoint open and receive events from the stream.
+        - The stream is parsed incrementally as NDJSON lines or Server-Sent Events.
+        - An NDJSON line is output as the decoded JSON value.
+        - A Server-Sent Event is output as a dict with event, data and id.
+        - The child node is run for each event, or for each micro-batch of events if batch_size is set.
+        - The events are queued up to queue_size. When the queue is full, the stream is not read until the child node catches up.
+        - When the connection is lost, the node reconnects with exponential backoff. For Server-Sent Events, the last event ID is sent on reconnection.
+      parameters:
+        url:
+          description:
+            - URL of the stream.
+        format:
+          description:
+            - Format of the stream. It can be either ndjson or sse.
+        headers:
+          description:
+            - Dict of request headers.
+        timeout:
+          description:
+            - Timeout in second to connect to the endpoint.
+        read_timeout:
+          description:
+            - Timeout in second to wait for the next data. If null, the node waits forever.
+        json_data:
+          description:
+            - If true, data of Server-Sent Events is decoded as JSON.
+        batch_size:
+          description:
+            - The maximum number of events passed to the child node at once as a list.
+            - If not set, the child node is run for each event.
+        batch_interval:
+          description:
+            - The maximum time in second to wait for a micro-batch to be filled.
+        queue_size:
+          description:
+            - The maximum number of events waiting for the child node.
+        reconnect_delay:
+          description:
+            - The initial delay in second before reconnecting. The delay is doubled on every failure.
+            - If the server sends a retry field of Server-Sent Events, the value is used as the delay instead.
+        max_reconnect_delay:
+          description:
+            - The maximum delay in second before reconnecting.
+        max_retries:
+          description:
+            - The maximum number of reconnections in a row. If null, the node reconnects forever.
+    EXAMPLE: |-
+      # Run child node for each line of a NDJSON stream
+      # Output: {"stream": {"name": "TEST:PV1", "value": 1.0}}
+      - http_stream:
+          name: "stream"
+          url: "http://example.com/api/events"
+          format: "ndjson"
+
+      # Run child node for up to 100 Server-Sent Events every second
+      # Output: {"stream": [{"event": "update", "data": {"value": 1.0}, "id": "1"}, ...]}
+      - http_stream:
+          name: "stream"
+          url: "http://example.com/api/sse"
+          format: "sse"
+          json_data: true
+          batch_size: 100
+          batch_interval: 1.0
+    """
+
+    # the child node is run in process() for each event
+    async def run(self) -> None:
+        await self._run_self()
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "url": ArgSpec(type="str", required=True),
+            "format": ArgSpec(type="str", required=False, default=StreamFormat.NDJSON),
+            "headers": ArgSpec(type="dict", required=False, default=None),
+            "timeout": ArgSpec(type="float", required=False, default=10),
+            "read_timeout": ArgSpec(type="float", required=False, default=None),
+            "json_data": ArgSpec(type="bool", required=False, default=False),
+            "batch_size": ArgSpec(type="int", required=False, default=None),
+            "batch_interval": ArgSpec(type="float", required=False, default=0.1),
+            "queue_size": ArgSpec(type="int", required=False, default=1000),
+            "reconnect_delay": ArgSpec(type="float", required=False, default=1.0),
+            "max_reconnect_delay": ArgSpec(type="float", required=False, default=30.0),
+            "max_retries": ArgSpec(type="int", required=False, default=None),
+            **_pool_argument_spec(),
+        }
+
+    async def process(self) -> None:
+        if self.params["format"] not in list(StreamFormat):
+            raise ValueError(f"{self.params['format']} is not valid stream format")
+
+        # the bounded queue applies backpressure to the stream
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.params["queue_size"])
+        async with asyncio.TaskGroup() as tg:
+            receiver = tg.create_task(self._receive(queue))
+            try:
+                await self._dispatch(queue)
+            finally:
+                receiver.cancel()
+
+    async def _receive(self, queue: asyncio.Queue) -> None:
+        url = self.params["url"]
+        session = get_session(url, _session_options(self.params))
+        timeout = ClientTimeout(
+            total=None,
+            sock_connect=self.params["timeout"],
+            sock_read=self.params["read_timeout"],
+        )
+        parser = SSEParser(self.params["json_data"])
+        delay = self.params["reconnect_delay"]
+        retries = 0
+
+        while True:
+            headers = dict(self.params["headers"] or {})
+            if self.params["format"] == StreamFormat.SSE:
+                headers.setdefault("Accept", "text/event-stream")
+                if parser.last_event_id is not None:
+                    headers["Last-Event-ID"] = parser.last_event_id
+
+            try:
+                async with session.get(url, headers=headers, timeout=timeout) as resp:
+                    if resp.status != 200:
+                        _logger.warning(f"{self.name}: {url} returned {resp.status}")
+                    else:
+                        delay = self.params["reconnect_delay"]
+                        retries = 0
+                        if self.params["format"] == StreamFormat.SSE:
+                            events = parser.events(resp.content)
+                        else:
+                            events = _iter_ndjson(resp.content)
+                        async for event in events:
+                            await queue.put(event)
+            except (ClientError, TimeoutError) as e:
+                _logger.warning(f"{self.name}: stream {url} failed: {e!r}")
+
+            max_retries = self.params["max_retries"]
+            if max_retries is not None and retries >= max_retries:
+                await queue.put(_END)
+                return
+
+            retries += 1
+            if parser.retry is not None:
+                # the delay requested by the server is used as it is
+                await asyncio.sleep(parser.retry)
+                continue
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+            delay = min(delay * 2, self.params["max_reconnect_delay"])
+
+    async def _dispatch(self, queue: asyncio.Queue) -> None:
+        batch_size = self.params["batch_size"]
+        while True:
+            event = await queue.get()
+            if event is _END:
+                return
+            if batch_size is None:
+                await self._emit(event)
+                continue
+
+            batch = [event]
+            end = await self._fill_batch(queue, batch, batch_size)
+            await self._emit(batch)
+            if end:
+                return
+
+    async def _fill_batch(self, queue: asyncio.Queue, batch: list, size: int) -> bool:
+        deadline = monotonic() + self.params["batch_interval"]
+        while len(batch) < size:
+            try:
+                async with asyncio.timeout(max(deadline - monotonic(), 0)):
+                    event = await queue.get()
+            except TimeoutError:
+                return False
+            if event is _END:
+                return True
+            batch.append(event)
+        return False
+
+    async def _emit(self, data: Any) -> None:
+        init_flowdata()
+        fd = ctx_flowdata.get()
+        fd[self.name] = data
+        if self.child is None:
+            return
+        await self.child.run()
+
+
+@node.register("http_listen")
+class HTTPListenNode(TriggerNode):
+    """
+    DOCUMENTATION:
+      short_description: Start a HTTP server and run child node for each posted JSON.
+      description:
+        - Start a HTTP server in the cauliflow process and run child node for each JSON body posted to the path.
+        - If the body is a JSON array and split is true, child node is run for each item of the array.
+        - The response is returned after child node finished. It is 200 with the number of the accepted items, 400 for an invalid JSON body and 500 if child node failed.
+        - The number of the requests in process is limited by max_inflight. When the limit is reached, 429 is returned.
+        - "The counters of requests and latency are returned as JSON by GET request to stats_path: requests, accepted, rejected, errors, inflight, total_latency, max_latency and avg_latency."
+      parameters:
+        host:
+          description:
+            - Host address to listen on.
+        port:
+          description:
+            - Port to listen on.
+        path:
+          description:
+            - Path to accept POST requests.
+        stats_path:
+          description:
+            - Path to return the counters. If null, the counters are not exposed.
+        split:
+          description:
+            - If true and the body is a JSON array, child node is run for each item.
+        max_inflight:
+          description:
+            - The maximum number of the requests in process.
+    EXAMPLE: |-
+      # Receive events posted to http://127.0.0.1:8080/events
+      # Output: {"listen": {"name": "TEST:PV1", "value": 1.0}}
+      - http_listen:
+          name: "listen"
+          port: 8080
+          path: "/events"
+          max_inflight: 50
+    """
+
+    def __init__(self, name: str, param_dict: dict | None = None):
+        super().__init__(name, param_dict)
+        self.stats = ListenStats()
+        self.addresses: list = []
+
+    # the child node is run by the request handler
+    async def run(self) -> None:
+        await self._run_self()
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "host": ArgSpec(type="str", required=False, default="127.0.0.1"),
+            "port": ArgSpec(type="int", required=False, default=8080),
+            "path": ArgSpec(type="str", required=False, default="/"),
+            "stats_path": ArgSpec(type="str", required=False, default="/stats"),
+            "split": ArgSpec(type="bool", required=False, default=True),
+            "max_inflight": ArgSpec(type="int", required=False, default=100),
+        }
+
+    async def process(self) -> None:
+        app = web.Application()
+        app.router.add_post(self.params["path"], self._handle)
+        if self.params["stats_path"] is not None:
+            app.router.add_get(self.params["stats_path"], self._handle_stats)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            site = web.TCPSite(runner, self.params["host"], self.params["port"])
+            await site.start()
+            self.addresses = runner.addresses
+            _logger.info(f"{self.name}: listening on {self.addresses}")
+            await asyncio.Future()
+        finally:
+            await runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.stats.requests += 1
+        if self.stats.inflight >= self.params["max_inflight"]:
+            self.stats.rejected += 1
+            return web.json_response({"error": "Too many requests"}, status=429)
+
+        start = perf_counter()
+        self.stats.inflight += 1
+        try:
+            return await self._process_request(request)
+        finally:
+            self.stats.inflight -= 1
+            latency = perf_counter() - start
+            self.stats.total_latency += latency
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+
+    async def _process_request(self, request: web.Request) -> web.Response:
+        try:
+            data = jsoncodec.loads(await request.read())
+        except ValueError:
+            self.stats.errors += 1
+            return web.json_response({"error": "Invalid JSON"}, status=400)
+
+        items = data if self.params["split"] and isinstance(data, list) else [data]
+        try:
+            for item in items:
+                await self._emit(item)
+        except Exception:
+            _logger.exception(f"{self.name}: failed to process the request")
+            self.stats.errors += 1
+            return web.json_response({"error": "Internal error"}, status=500)
+
+        self.stats.accepted += len(items)
+        return web.json_response({"accepted": len(items)})
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        stats = asdict(self.stats)
+        completed = self.stats.requests - self.stats.rejected - self.stats.inflight
+        stats["avg_latency"] = (
+            self.stats.total_latency / completed if completed else 0.0
+        )
+        return web.json_response(stats)
+
+    async def _emit(self, data: Any) -> None:
+        init_flowdata()
+        fd = ctx_flowdata.get()
+        fd[self.name] = data
+        if self.child is None:
+            return
+        await self.child.run()
+
+
+class BulkSender:
+    # Events are serialized when they are added, and sent as one body per batch.
+    # Batches are numbered in the order they are formed, and up to max_inflight
+    # batches are sent in parallel. stats.acked is the number of the leading
+    # batches which have all completed, even if the later ones completed first.
+    def __init__(
+        self,
+        url: str,
+        format: str | BulkFormat = BulkFormat.JSON,
+        compress: bool = False,
+        max_count: int = 1000,
+        max_bytes: int = 1048576,
+        flush_interval: float = 1.0,
+        max_inflight: int = 4,
+        timeout: float = 10,
+        headers: dict | None = None,
+        options: SessionOptions | None = None,
+    ):
+        if format not in list(BulkFormat):
+            raise ValueError(f"{format} is not valid bulk format")
+
+        self.url = url
+        self.format = format
+        self.compress = compress
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.timeout = ClientTimeout(total=timeout)
+        self.headers = headers or {}
+        self.options = options
+        self.buffer: list[bytes] = []
+        self.size = 0
+        self.semaphore = asyncio.Semaphore(max_inflight)
+        self.tasks: set[asyncio.Task] = set()
+        self.timer_task: asyncio.Task | None = None
+        self.sequence = 0
+        self.completed: set[int] = set()
+        self.stats = BulkStats()
+        # held while a batch is taken from the buffer and until its task is created
+        self.flush_lock = asyncio.Lock()
+
+    async def add(self, events: list) -> None:
+        for event in events:
+            line = jsoncodec.dumps(event).encode()
+            self.buffer.append(line)
+            self.size += len(line) + 1
+
+        if len(self.buffer) >= self.max_count or self.size >= self.max_bytes:
+            await self.flush()
+        elif self.buffer and self.timer_task is None:
+            self.timer_task = asyncio.create_task(self._start_timer())
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            if not self.buffer:
+                return
+            lines = self.buffer
+            self.buffer = []
+            self.size = 0
+            sequence = self.sequence
+            self.sequence += 1
+
+            # the caller waits here while max_inflight batches are in flight
+            await self.semaphore.acquire()
+            task = asyncio.create_task(self._send(sequence, lines))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def close(self) -> None:
+        if self.timer_task is not None:
+            self.timer_task.cancel()
+            self.timer_task = None
+        # this waits for a flush by the timer which is waiting for the semaphore
+        await self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    async def _start_timer(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self.timer_task = None
+        await self.flush()
+
+    async def _send(self, sequence: int, lines: list[bytes]) -> None:
+        try:
+            body, headers = await self._encode(lines)
+            headers["X-Batch-Sequence"] = str(sequence)
+            session = get_session(self.url, self.options)
+            async with session.post(
+                self.url, data=body, headers=headers, timeout=self.timeout
+            ) as resp:
+                if resp.status >= 300:
+                    raise ClientError(f"{self.url} returned {resp.status}")
+            self.stats.batches += 1
+            self.stats.events += len(lines)
+        except (ClientError, TimeoutError) as e:
+            self.stats.failed += 1
+            _logger.warning(f"failed to send batch {sequence}: {e!r}")
+        finally:
+            self.semaphore.release()
+            self._complete(sequence)
+
+    async def _encode(self, lines: list[bytes]) -> tuple[bytes, dict]:
+        headers = dict(self.headers)
+        if self.format == BulkFormat.NDJSON:
+            body = b"\n".join(lines) + b"\n"
+            headers.setdefault("Content-Type", "application/x-ndjson")
         else:
+            body = b"[" + b",".join(lines) + b"]"
+            headers.setdefault("Content-Type", "application/json")
+
+        if self.compress:
+            # compression runs in a worker thread to keep the event loop responsive
+            body = await asyncio.to_thread(gzip.compress, body)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def _complete(self, sequence: int) -> None:
+        self.completed.add(sequence)
+        while self.stats.acked in self.completed:
+            self.completed.remove(self.stats.acked)
+            self.stats.acked += 1
+
+
+# senders shared by all http_bulk nodes with the same URL and settings
+_senders: dict[tuple, BulkSender] = {}
+
+
+def get_sender(url: str, **kwargs) -> BulkSender:
+    key = (url, *(_hashable(v) for v in kwargs.values()))
+    sender = _senders.get(key)
+    if sender is None:
+        sender = BulkSender(url, **kwargs)
+        _senders[key] = sender
+        register_shutdown(close_senders)
+    return sender
+
+
+async def close_senders() -> None:
+    while _senders:
+        _, sender = _senders.popitem()
+        await sender.close()
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return value
+
+
+@node.register("http_bulk")
+class HTTPBulkNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Send events to a HTTP endpoint in batches.
+      description:
+        - Accumulate events and POST them to a HTTP endpoint as one JSON array or NDJSON body.
+        - A batch is sent when the number of the events reaches max_count, the size of the body reaches max_bytes or flush_interval has elapsed.
+        - The batches are sent in parallel up to max_inflight over the pooled sessions. When the limit is reached, the node waits for a batch to complete.
+        - Each batch has the header X-Batch-Sequence numbered in the order the batches are formed, so that the receiver can restore the order. Set max_inflight to 1 to send the batches strictly in order.
+        - The events are shared by all http_bulk nodes with the same URL and settings, and the remaining events are sent when the flows are finished.
+      parameters:
+        url:
+          description:
+            - URL.
+        src:
+          description:
+            - An event or a list of events to send.
+        split:
+          description:
+            - If true and src is a list, each item of the list is an event.
+        format:
+          description:
+            - Format of the body. It can be either json or ndjson.
+        gzip:
+          description:
+            - If true, the body is compressed with gzip.
+        max_count:
+          description:
+            - The maximum number of the events in a batch.
+        max_bytes:
+          description:
+            - The maximum size of the uncompressed body in bytes.
+        flush_interval:
+          description:
+            - The maximum time in second for the events to stay in the buffer.
+        max_inflight:
+          description:
+            - The maximum number of the batches sent in parallel.
+        timeout:
+          description:
+            - Timeout of each request in second.
+        headers:
+          description:
+            - Dict of request headers.
+        pool_limit:
+          description:
+            - The maximum number of simultaneous connections of the shared session.
+        pool_limit_per_host:
+          description:
+            - The maximum number of simultaneous connections to the same host. 0 means no limit.
+        dns_cache_ttl:
+          description:
+            - Time in second to cache DNS lookups. If null, DNS lookups are not cached.
+        keepalive_timeout:
+          description:
+            - Time in second to keep an idle connection alive.
+    EXAMPLE: |-
+      # Send the PV data to the ingest API as gzip compressed NDJSON
+      - camonitor:
+          name: "camonitor"
+          pvname: ["TEST:PV1", "TEST:PV2"]
+      - http_bulk:
+          name: "bulk"
+          url: "http://example.com/api/ingest"
+          src: "{{ fd.camonitor }}"
+          format: "ndjson"
+          gzip: true
+          max_count: 500
+          flush_interval: 0.5
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "url": ArgSpec(type="str", required=True),
+            "src": ArgSpec(type="any", required=True),
+            "split": ArgSpec(type="bool", required=False, default=True),
+            "format": ArgSpec(type="str", required=False, default=BulkFormat.JSON),
+            "gzip": ArgSpec(type="bool", required=False, default=False),
+            "max_count": ArgSpec(type="int", required=False, default=1000),
+            "max_bytes": ArgSpec(type="int", required=False, default=1048576),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+            "max_inflight": ArgSpec(type="int", required=False, default=4),
+            "timeout": ArgSpec(type="float", required=False, default=10),
+            "headers": ArgSpec(type="dict", required=False, default=None),
+            **_pool_argument_spec(),
+        }
+
+    async def process(self) -> None:
+        sender = get_sender(
+            self.params["url"],
+            format=self.params["format"],
+            compress=self.params["gzip"],
+            max_count=self.params["max_count"],
+            max_bytes=self.params["max_bytes"],
+            flush_interval=self.params["flush_interval"],
+            max_inflight=self.params["max_inflight"],
+            timeout=self.params["timeout"],
+            headers=self.params["headers"],
+            options=_session_options(self.params),
+        )
+        src = self.params["src"]
+        events = src if self.params["split"] and isinstance(src, list) else [src]
+        await sender.add(events)
+
+
+class SSEParser:
+    def __init__(self, json_data: bool = False):
+        self.json_data = json_data
+        self.last_event_id: str | None = None
+        self.retry: float | None = None
+
+    async def events(self, content: StreamReader) -> AsyncIterator[dict]:
+        data: list[str] = []
+        event_type = ""
+        async for raw in _iter_lines(content):
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if not line:
+                # a blank line dispatches the event
+                if data:
+                    yield self._event(event_type, "\n".join(data))
+                data = []
+                event_type = ""
+                continue
+            if line.startswith(":"):
+                continue
+
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+            match field:
+                case "data":
+                    data.append(value)
+                case "event":
+                    event_type = value
+                case "id":
+                    self.last_event_id = value
+                case "retry" if value.isdigit():
+                    self.retry = int(value) / 1000
+
+    def _event(self, event_type: str, data: str) -> dict:
+        value: Any = data
+        if self.json_data:
+            try:
+                value = jsoncodec.loads(data)
+            except ValueError:
+                _logger.warning(f"invalid JSON data: {data}")
+        return {
+            "event": event_type or "message",
+            "data": value,
+            "id": self.last_event_id,
+        }
+
+
+async def _iter_lines(content: StreamReader) -> AsyncIterator[bytes]:
+    while True:
+        try:
+            line = await content.readline()
+        except ValueError as e:
+            # the line longer than the buffer limit is skipped
+            _logger.warning(f"invalid line in the stream: {e}")
+            continue
+        if not line:
+            return
+        yield line
+
+
+async def _iter_ndjson(content: StreamReader) -> AsyncIterator[Any]:
+    async for raw in _iter_lines(content):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            yield jsoncodec.loads(line)
+        except ValueError:
+            _logger.warning(f"invalid JSON line: {line!r}")
+
+
+def _pool_argument_spec() -> dict[str, ArgSpec]:
+    return {
+        "pool_limit": ArgSpec(type="int", required=False, default=100),
+        "pool_limit_per_host": ArgSpec(type="int", required=False, default=0),
+        "dns_cache_ttl": ArgSpec(type="int", required=False, default=10),
+        "keepalive_timeout": ArgSpec(type="float", required=False, default=15.0),
+    }
+
+
+def _session_options(params: dict) -> SessionOptions:
+    return SessionOptions(
+        limit=params["pool_limit"],
+        limit_per_host=params["pool_limit_per_host"],
+        dns_cache_ttl=params["dns_cache_ttl"],
+        keepalive_timeout=params["keepalive_timeout"],
+    )
+
+
+def _request_kwargs(method: str, body: str) -> dict | None:
+    match method:
+        case MethodType.GET | MethodType.DELETE:
+            return {}
+        case MethodType.PUT | MethodType.POST | MethodType.PATCH:
+            return {"data": body}
+        case _:
+            return None
+
+
+async def _send(
+    session: ClientSession,
+    method: str,
+    url: str,
+    body: str,
+    timeout: ClientTimeout,
+    format: str,
+    json_path: str | None = None,
+) -> SuccessOut | dict:
+    kwargs = _request_kwargs(method, body)
+    if kwargs is None:
+        return {"error": "Illegal HTTP method"}
+
+    async with session.request(method.upper(), url, timeout=timeout, **kwargs) as resp:
+        return await _get_output(resp, format, json_path)
+
+
+async def _fetch(
+    session: ClientSession,
+    method: str,
+    url: str,
+    body: str,
+    timeout: ClientTimeout,
+    format: str,
+    headers: dict[str, str],
+    json_path: str | None = None,
+) -> CachedResponse:
+    kwargs = _request_kwargs(method, body)
+    if kwargs is None:
+        return CachedResponse(0, {"error": "Illegal HTTP method"})
+
+    async with session.request(
+        method.upper(), url, headers=headers, timeout=timeout, **kwargs
+    ) as resp:
+        if resp.status == 304:
+            return CachedResponse(resp.status, None)
+        return CachedResponse(
+            resp.status,
+            await _get_output(resp, format, json_path),
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+
+
+async def _get_output(
+    resp: ClientResponse, format: str, json_path: str | None = None
+) -> SuccessOut:
+    match format:
+        case ResDataFormat.JSON:
+            data = await _decode_json(await resp.read(), json_path)
+        case ResDataFormat.RAW:
+            data = await resp.read()
+        case _:
             data = await resp.text()
-        out: SuccessOut = {"status": resp.status, "data": data}
-        return out
+    out: SuccessOut = {"status": resp.status, "data": data}
+    return out
+
+
+async def _decode_json(body: bytes, json_path: str | None = None) -> Any:
+    if not body.strip():
+        return None
+    if len(body) < _THREAD_DECODE_SIZE:
+        return _extract(jsoncodec.loads(body), json_path)
+    # the decoded document is dropped in the worker thread except the extracted value
+    return await asyncio.to_thread(lambda: _extract(jsoncodec.loads(body), json_path))
+
+
+def _extract(data: Any, json_path: str | None) -> Any:
+    if json_path is None:
+        return data
+    for key in json_path.split("."):
+        if isinstance(data, list) and key.lstrip("-").isdigit():
+            index = int(key)
+            data = data[index] if -len(data) <= index < len(data) else None
+        elif isinstance(data, dict):
+            data = data.get(key)
+        else:
+            data = None
+        if data is None:
+            return None
+    return data
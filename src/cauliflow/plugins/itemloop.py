@@ -1,11 +1,38 @@
-from functools import singledispatchmethod
-
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from enum import StrEnum
+from functools import partial
+from itertools import islice, product
+from math import prod
+from typing import Literal
+
+from cauliflow.blackboard import BlackBoard
+from cauliflow.context import ctx_blackboard, ctx_flowdata, ctx_macros
+from cauliflow.flowdata import FlowData
 from cauliflow.logging import get_logger
+from cauliflow.macros import Macros
 from cauliflow.node import ArgSpec, ProcessNode, node
-from cauliflow.variable import Variable
+from cauliflow.shutdown import register_shutdown
+from cauliflow.variable import Variable, make_namespace
+from cauliflow.vectorize import (
+    Unsupported,
+    compile_vectorized,
+    np,
+    product_columns,
+)
 
 _logger = get_logger(__name__)
 
+_process_pool: ProcessPoolExecutor | None = None
+
+
+class ExecutorType(StrEnum):
+    INLINE = "inline"
+    PROCESS = "process"
+
 
 @node.register("for_list")
 class ForList(ProcessNode):
@@ -30,6 +57,27 @@ class ForList(ProcessNode):
           description:
             - Condition not to add item for a crated list.
             - Loop item can be refereed as same as in expression.
+        executor:
+          description:
+            - Set either of inline or process.
+            - In inline mode, the loop is run in the event loop.
+            - In process mode, the items of the first loop are partitioned and the loop is run in a process pool.
+            - The results are merged in order of the items.
+            - The flowdata, blackboard and macros referred in the expressions are copied to the processes.
+        workers:
+          description:
+            - The number of partitions of the items in process mode.
+            - If this parameter is not set, the number of CPUs is used.
+        stream:
+          description:
+            - If this parameter is set to True, a generator is output instead of a created list.
+            - The items are created when the downstream node consumes the generator, and the generator can be consumed only once.
+            - This parameter cannot be used with process executor.
+        vectorize:
+          description:
+            - If this parameter is set to True, the expression and the filter are evaluated with NumPy array operations over all items at once.
+            - Only the arithmetic, comparison and logical operators of numbers and loop items are vectorized, and the loop items must be lists of int or lists of float.
+            - Otherwise, the items are evaluated one by one as usual.
     EXAMPLE: |-
       # Create a list from list of list with filter parameter.
       # Output: {'for_list': [3, 4, 6]}
@@ -67,12 +115,31 @@ class ForList(ProcessNode):
           name: "for_list"
           lists: [[{"first": "hello, ", "second": "world"}, {"first": "foo", "second": "bar"}]]
           expression:  "item0.first + item0.second"
+
+      # Scale and threshold a waveform with NumPy.
+      # Output: {'for_list': [0.2, 0.4, 0.6]}
+      - for_list:
+          name: "for_list"
+          lists: [1.0, 2.0, 3.0, 4.0]
+          expression: "item0 * 0.2"
+          filter: "item0 * 0.2 > 0.7"
+          vectorize: yes
+
+      # Create a large list of PV names in a process pool.
+      # Output: {'for_list': ['head1:pv1', 'head1:pv2', ..., 'head100:pv1000']}
+      - for_list:
+          name: "for_list"
+          lists: "{{ [fd.heads, fd.pvs] }}"
+          expression: "item0 + ':' + item1"
+          executor: "process"
+          workers: 4
     """
 
     def __init__(self, name: str, param_dict: dict | None = None):
         super().__init__(name, param_dict)
         self.variable = None
         self.filter = None
+        self.vector_funcs: tuple | Literal[False] | None = None
 
     def set_argument_spec(self) -> dict[str, ArgSpec]:
         self.set_common_output_args()
@@ -80,76 +147,97 @@ class ForList(ProcessNode):
             "lists": ArgSpec(type="list[list|dict]", required=True),
             "expression": ArgSpec(type="expression", required=True),
             "filter": ArgSpec(type="expression", required=False, default=None),
+            "executor": ArgSpec(
+                type="str", required=False, default=ExecutorType.INLINE
+            ),
+            "workers": ArgSpec(type="int", required=False, default=None),
+            "stream": ArgSpec(type="bool", required=False, default=False),
+            "vectorize": ArgSpec(type="bool", required=False, default=False),
         }
 
     async def process(self) -> None:
-        if self.variable is None:
-            self.variable = Variable("{{" + self.params["expression"] + "}}")
-        if self.filter is None and self.params["filter"] is not None:
-            self.filter = Variable("{{" + self.params["filter"] + "}}")
-
-        lists = self.params["lists"]
-        is_dict = isinstance(lists, dict)
-
-        if is_dict:
-            items = self._for_loop(lists, 0, [], {})
-            self.output(items)
-            return
-
-        if not isinstance(lists, list):
-            raise ValueError
+        self._compile()
+        self._validate_variable()
 
-        if len(lists) < 1:
+        loop_lists = _get_loop_lists(self.params["lists"])
+        if loop_lists is None:
             return
 
-        has_list_or_dict = isinstance(lists[0], (list, dict))
-        loop_lists = lists if has_list_or_dict else [lists]
-
-        items = self._for_loop(loop_lists[0], 0, loop_lists[1:], {})
+        items = None
+        if self.params["vectorize"]:
+            items = self._vectorized(loop_lists)
+
+        if items is not None:
+            pass
+        elif self.params["executor"] == ExecutorType.PROCESS:
+            if self.params["stream"]:
+                raise ValueError("stream is not supported with process executor")
+            items = []
+            for part in await _for_loop_in_process(self, loop_lists):
+                items.extend(part)
+        elif self.params["stream"]:
+            # the namespace is bound now, not when the generator is consumed
+            items = self._iter_results(loop_lists, make_namespace())
+        else:
+            items = self._for_loop(loop_lists)
         self.output(items)
 
-    @singledispatchmethod
-    def _for_loop(
-        self, iterable, depth: int, remaining_lists: list, var_dict: dict
-    ) -> list:
-        _logger.critical("Input must be a list or dict")
-        return []
-
-    @_for_loop.register
-    def _(
-        self, for_list: list, depth: int, remaining_lists: list, var_dict: dict
-    ) -> list:
-        self._validate_variable()
-
-        results = []
-        for item in for_list:
-            var_dict[f"item{depth}"] = item
-            results.extend(self._process_next_level(depth, remaining_lists, var_dict))
-        return results
-
-    @_for_loop.register
-    def _(
-        self, for_dict: dict, depth: int, remaining_lists: list, var_dict: dict
-    ) -> list:
-        self._validate_variable()
+    def _compile(self) -> None:
+        if self.variable is None:
+            self.variable = Variable("{{" + self.params["expression"] + "}}")
+        if self.filter is None and self.params["filter"] is not None:
+            self.filter = Variable("{{" + self.params["filter"] + "}}")
 
-        results = []
-        for key, value in for_dict.items():
-            var_dict[f"item{depth}_key"] = key
-            var_dict[f"item{depth}_val"] = value
-            results.extend(self._process_next_level(depth, remaining_lists, var_dict))
-        return results
-
-    def _process_next_level(
-        self, depth: int, remaining_lists: list, var_dict: dict
-    ) -> list:
-        if remaining_lists:
-            return self._for_loop(
-                remaining_lists[0], depth + 1, remaining_lists[1:], var_dict
-            )
-        if self.filter and self.filter.fetch(extend=var_dict):
-            return []
-        return [self.variable.fetch(extend=var_dict)]  # type: ignore
+    def _variables(self) -> list[Variable]:
+        return [v for v in (self.variable, self.filter) if v is not None]
+
+    def _vectorized(self, loop_lists: list) -> list | None:
+        if self.vector_funcs is None:
+            try:
+                self.vector_funcs = (
+                    compile_vectorized(self.variable),  # type: ignore
+                    compile_vectorized(self.filter, logical=True)
+                    if self.filter
+                    else None,
+                )
+            except Unsupported as e:
+                _logger.debug(f"fall back to per-item evaluation: {e}")
+                self.vector_funcs = False
+
+        if self.vector_funcs is False:
+            return None
+
+        var_names = set()
+        for v in self._variables():
+            var_names.update(v.var_names())
+
+        columns = product_columns(loop_lists, var_names)
+        if columns is None:
+            _logger.debug("fall back to per-item evaluation: items are not numeric")
+            return None
+
+        size = prod(len(v) for v in loop_lists)
+        expr_func, filter_func = self.vector_funcs
+        try:
+            # errors like zero division are raised by the per-item evaluation
+            with np.errstate(all="raise"):
+                results = np.broadcast_to(expr_func(columns), (size,))
+                if filter_func is not None:
+                    mask = np.broadcast_to(filter_func(columns), (size,))
+                    results = results[~mask.astype(bool)]
+        except (Unsupported, FloatingPointError) as e:
+            _logger.debug(f"fall back to per-item evaluation: {e}")
+            return None
+        return results.tolist()
+
+    def _for_loop(self, loop_lists: list) -> list:
+        return list(self._iter_results(loop_lists, make_namespace()))
+
+    def _iter_results(self, loop_lists: list, namespace: dict) -> Iterator:
+        for _ in _iter_product(loop_lists, namespace):
+            if self.filter and self.filter.evaluate(namespace):
+                continue
+            yield self.variable.evaluate(namespace)  # type: ignore
 
     def _validate_variable(self):
         if self.variable is None:
@@ -183,6 +271,22 @@ class ForDict(ProcessNode):
           description:
             - Condition not to add item for a crated dict.
             - Loop item can be refereed as same as in expression.
+        executor:
+          description:
+            - Set either of inline or process.
+            - In inline mode, the loop is run in the event loop.
+            - In process mode, the items of the first loop are partitioned and the loop is run in a process pool.
+            - The results are merged in order of the items.
+            - The flowdata, blackboard and macros referred in the expressions are copied to the processes.
+        workers:
+          description:
+            - The number of partitions of the items in process mode.
+            - If this parameter is not set, the number of CPUs is used.
+        stream:
+          description:
+            - If this parameter is set to True, a generator of key and value pairs is output instead of a created dict.
+            - The items are created when the downstream node consumes the generator, and the generator can be consumed only once.
+            - This parameter cannot be used with process executor.
     EXAMPLE: |-
       # Create a dict from list of list and dict.
       # Output: {'for_dict': {'head1:name1': 'val1', 'head1:name2': 'val2', 'head2:name1': 'val1', 'head2:name2': 'val2'}}
@@ -223,9 +327,35 @@ class ForDict(ProcessNode):
             "key": ArgSpec(type="expression", required=True),
             "val": ArgSpec(type="expression", required=True),
             "filter": ArgSpec(type="expression", required=False, default=None),
+            "executor": ArgSpec(
+                type="str", required=False, default=ExecutorType.INLINE
+            ),
+            "workers": ArgSpec(type="int", required=False, default=None),
+            "stream": ArgSpec(type="bool", required=False, default=False),
         }
 
     async def process(self) -> None:
+        self._compile()
+        self._validate_variable()
+
+        loop_lists = _get_loop_lists(self.params["lists"])
+        if loop_lists is None:
+            return
+
+        if self.params["executor"] == ExecutorType.PROCESS:
+            if self.params["stream"]:
+                raise ValueError("stream is not supported with process executor")
+            items = {}
+            for part in await _for_loop_in_process(self, loop_lists):
+                items.update(part)
+        elif self.params["stream"]:
+            # the namespace is bound now, not when the generator is consumed
+            items = self._iter_results(loop_lists, make_namespace())
+        else:
+            items = self._for_loop(loop_lists)
+        self.output(items)
+
+    def _compile(self) -> None:
         if self.key is None:
             self.key = Variable("{{" + self.params["key"] + "}}")
         if self.val is None:
@@ -233,71 +363,134 @@ class ForDict(ProcessNode):
         if self.filter is None and self.params["filter"] is not None:
             self.filter = Variable("{{" + self.params["filter"] + "}}")
 
-        lists = self.params["lists"]
-        is_dict = isinstance(lists, dict)
-
-        if is_dict:
-            items = self._for_loop(lists, 0, [], {})
-            self.output(items)
-            return
-
-        if not isinstance(lists, list):
-            raise ValueError
-
-        if len(lists) < 1:
-            return
-
-        has_list_or_dict = isinstance(lists[0], (list, dict))
-        loop_lists = lists if has_list_or_dict else [lists]
-
-        items = self._for_loop(loop_lists[0], 0, loop_lists[1:], {})
-        self.output(items)
-
-    @singledispatchmethod
-    def _for_loop(
-        self, iterable, depth: int, remaining_lists: list, var_dict: dict
-    ) -> dict:
-        _logger.critical("Input must be a list or dict")
-        return {}
-
-    @_for_loop.register
-    def _(
-        self, for_list: list, depth: int, remaining_lists: list, var_dict: dict
-    ) -> dict:
-        self._validate_variable()
-
-        results = {}
-        for item in for_list:
-            var_dict[f"item{depth}"] = item
-            results.update(self._process_next_level(depth, remaining_lists, var_dict))
-        return results
+    def _variables(self) -> list[Variable]:
+        return [v for v in (self.key, self.val, self.filter) if v is not None]
 
-    @_for_loop.register
-    def _(
-        self, for_dict: dict, depth: int, remaining_lists: list, var_dict: dict
-    ) -> dict:
-        self._validate_variable()
+    def _for_loop(self, loop_lists: list) -> dict:
+        return dict(self._iter_results(loop_lists, make_namespace()))
 
-        results = {}
-        for key, value in for_dict.items():
-            var_dict[f"item{depth}_key"] = key
-            var_dict[f"item{depth}_val"] = value
-            results.update(self._process_next_level(depth, remaining_lists, var_dict))
-        return results
-
-    def _process_next_level(
-        self, depth: int, remaining_lists: list, var_dict: dict
-    ) -> dict:
-        if remaining_lists:
-            return self._for_loop(
-                remaining_lists[0], depth + 1, remaining_lists[1:], var_dict
-            )
-        if self.filter and self.filter.fetch(extend=var_dict):
-            return {}
-        _key = self.key.fetch(extend=var_dict)  # type: ignore
-        _val = self.val.fetch(extend=var_dict)  # type: ignore
-        return {_key: _val}
+    def _iter_results(self, loop_lists: list, namespace: dict) -> Iterator[tuple]:
+        for _ in _iter_product(loop_lists, namespace):
+            if self.filter and self.filter.evaluate(namespace):
+                continue
+            _key = self.key.evaluate(namespace)  # type: ignore
+            _val = self.val.evaluate(namespace)  # type: ignore
+            yield (_key, _val)
 
     def _validate_variable(self):
         if self.key is None or self.val is None:
             raise ValueError("Variable is not set.")
+
+
+def _get_loop_lists(lists) -> list | None:
+    if isinstance(lists, dict):
+        return [lists]
+
+    if not isinstance(lists, list):
+        raise ValueError
+
+    if len(lists) < 1:
+        return None
+
+    has_list_or_dict = isinstance(lists[0], (list, dict))
+    return lists if has_list_or_dict else [lists]
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn is used because fork is not safe with the threads of the CA client
+        ctx = multiprocessing.get_context("spawn")
+        _process_pool = ProcessPoolExecutor(mp_context=ctx)
+        register_shutdown(close_process_pool)
+    return _process_pool
+
+
+async def close_process_pool() -> None:
+    global _process_pool
+    if _process_pool is None:
+        return
+    pool = _process_pool
+    _process_pool = None
+    await asyncio.to_thread(pool.shutdown)
+
+
+async def _for_loop_in_process(
+    loop_node: ForList | ForDict, loop_lists: list
+) -> list[list | dict]:
+    workers = loop_node.params["workers"] or os.cpu_count() or 1
+    parts = _partition(loop_lists[0], workers)
+
+    # only the variables referred in the expressions are copied to the workers
+    var_names = set()
+    for v in loop_node._variables():
+        var_names.update(v.var_names())
+    ctx_vars = {
+        "fd": dict(ctx_flowdata.get()) if "fd" in var_names else {},
+        "bb": dict(ctx_blackboard.get()) if "bb" in var_names else {},
+        "macro": dict(ctx_macros.get()) if "macro" in var_names else {},
+    }
+
+    params = {k: v for k, v in loop_node.params.items() if k != "lists"}
+    loop = asyncio.get_running_loop()
+    pool = _get_process_pool()
+    func = partial(
+        _for_loop_worker,
+        type(loop_node),
+        loop_node.name,
+        params,
+        remaining_lists=loop_lists[1:],
+        ctx_vars=ctx_vars,
+    )
+    return await asyncio.gather(
+        *[loop.run_in_executor(pool, func, part) for part in parts]
+    )
+
+
+def _partition(iterable: list | dict, num: int) -> list[list | dict]:
+    items = list(iterable.items()) if isinstance(iterable, dict) else iterable
+    size = max(1, -(-len(items) // num))
+    it = iter(items)
+    parts = []
+    while part := list(islice(it, size)):
+        parts.append(dict(part) if isinstance(iterable, dict) else part)
+    return parts
+
+
+def _for_loop_worker(
+    node_class: type[ForList | ForDict],
+    name: str,
+    params: dict,
+    part: list | dict,
+    remaining_lists: list,
+    ctx_vars: dict,
+) -> list | dict:
+    ctx_flowdata.set(FlowData(ctx_vars["fd"]))
+    ctx_blackboard.set(BlackBoard(ctx_vars["bb"]))
+    ctx_macros.set(Macros(ctx_vars["macro"]))
+
+    loop_node = node_class(name=name)
+    loop_node.params.update(params)
+    loop_node._compile()
+    return loop_node._for_loop([part] + remaining_lists)
+
+
+def _iter_product(loop_lists: list, namespace: dict) -> Iterator[dict]:
+    # bindings of loop items are prepared for each level, and then
+    # they are written into the same namespace for each combination
+    levels = []
+    for depth, iterable in enumerate(loop_lists):
+        if isinstance(iterable, dict):
+            key_name, val_name = f"item{depth}_key", f"item{depth}_val"
+            levels.append([((key_name, k), (val_name, v)) for k, v in iterable.items()])
+        elif isinstance(iterable, list):
+            name = f"item{depth}"
+            levels.append([((name, item),) for item in iterable])
+        else:
+            _logger.critical("Input must be a list or dict")
+            return
+
+    for combination in product(*levels):
+        for bindings in combination:
+            namespace.update(bindings)
+        yield namespace
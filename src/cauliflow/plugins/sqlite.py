@@ -0,0 +1,319 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from time import monotonic
+from typing import Any
+
+from cauliflow import jsoncodec
+from cauliflow.context import ctx_flowdata
+from cauliflow.flowdata import FlowData
+from cauliflow.logging import get_logger
+from cauliflow.node import ArgSpec, ProcessNode, node
+from cauliflow.shutdown import register_shutdown
+
+_logger = get_logger(__name__)
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    # Rows are inserted on a dedicated thread which owns the connection.
+    # They are committed in a transaction per batch, when the number of the
+    # pending rows reaches batch_size or flush_interval has elapsed.
+    def __init__(self, path: Path, batch_size: int = 1000, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue()
+        self.error: Exception | None = None
+        # the connection is opened here so that the error reaches the node
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+        self.thread = threading.Thread(
+            target=self._run, name=f"sqlite-writer:{path}", daemon=True
+        )
+        self.thread.start()
+
+    def write(self, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+        if not self.thread.is_alive():
+            raise RuntimeError(f"writer of {self.path} is stopped") from self.error
+        self.queue.put((table, columns, rows))
+
+    async def close(self) -> None:
+        self.queue.put(_STOP)
+        await asyncio.to_thread(self.thread.join)
+        if self.error is not None:
+            raise RuntimeError(f"writer of {self.path} failed") from self.error
+
+    def _run(self) -> None:
+        try:
+            self._loop(self.conn)
+        except Exception as e:
+            self.error = e
+            _logger.exception(f"writer of {self.path} failed")
+        finally:
+            self.conn.close()
+
+    def _loop(self, conn: sqlite3.Connection) -> None:
+        created: set[tuple[str, tuple[str, ...]]] = set()
+        pending: dict[tuple[str, tuple[str, ...]], list[tuple]] = {}
+        count = 0
+        deadline: float | None = None
+
+        while True:
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+
+            if item is not None:
+                table, columns, rows = item
+                pending.setdefault((table, columns), []).extend(rows)
+                count += len(rows)
+                if deadline is None:
+                    deadline = monotonic() + self.flush_interval
+
+            if count >= self.batch_size or (
+                deadline is not None and monotonic() >= deadline
+            ):
+                _commit(conn, pending, created)
+                count = 0
+                deadline = None
+
+        _commit(conn, pending, created)
+
+
+def _commit(
+    conn: sqlite3.Connection,
+    pending: dict[tuple[str, tuple[str, ...]], list[tuple]],
+    created: set[tuple[str, tuple[str, ...]]],
+) -> None:
+    # each table is committed separately so that an error of a table does not
+    # drop the rows of the other tables
+    for (table, columns), rows in pending.items():
+        names = ", ".join(_quote(c) for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        try:
+            with conn:
+                if (table, columns) not in created:
+                    conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({names})"
+                    )
+                conn.executemany(
+                    f"INSERT INTO {_quote(table)} ({names}) VALUES ({placeholders})",
+                    rows,
+                )
+            created.add((table, columns))
+        except sqlite3.Error:
+            _logger.exception(f"failed to insert {len(rows)} rows into {table}")
+    pending.clear()
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _to_sql(value: Any) -> Any:
+    if value is None or isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, (bool, int, float)):
+        # augmented CA values are converted into plain values
+        return jsoncodec.to_builtin(value)
+    if isinstance(value, (dict, list, tuple)):
+        return jsoncodec.dumps(value)
+    value = jsoncodec.to_builtin(value)
+    if isinstance(value, (list, dict)):
+        return jsoncodec.dumps(value)
+    return value
+
+
+# writers shared by all nodes writing to the same database
+_writers: dict[Path, SQLiteWriter] = {}
+
+
+def get_writer(
+    path: Path, batch_size: int = 1000, flush_interval: float = 1.0
+) -> SQLiteWriter:
+    key = path.resolve()
+    writer = _writers.get(key)
+    if writer is None:
+        writer = SQLiteWriter(key, batch_size, flush_interval)
+        _writers[key] = writer
+        register_shutdown(close_writers)
+    return writer
+
+
+async def close_writers() -> None:
+    while _writers:
+        _, writer = _writers.popitem()
+        await writer.close()
+
+
+@node.register("out_sqlite")
+class OutSQLiteNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Insert rows into a table of SQLite database.
+      description:
+        - Insert rows into a table of SQLite database.
+        - The rows are buffered and inserted with executemany in a transaction on a dedicated writer thread.
+        - A transaction is committed when the number of the buffered rows reaches batch_size or flush_interval has elapsed.
+        - The table is created if it does not exist.
+        - Dict and list values are stored as JSON text.
+      parameters:
+        path:
+          description:
+            - The path of the SQLite database file.
+        table:
+          description:
+            - The name of the table.
+        src:
+          description:
+            - A dict or a list of dicts to insert. The keys of the dict are used as column names.
+        columns:
+          description:
+            - List of column names to insert.
+            - If not set, the keys of the first row are used.
+        batch_size:
+          description:
+            - The number of rows to commit at once.
+            - The value of the first node using the database is used.
+        flush_interval:
+          description:
+            - The maximum time in second for the rows to stay in the buffer.
+            - The value of the first node using the database is used.
+    EXAMPLE: |-
+      # Insert the PV data into pv table of pv.db
+      - camonitor:
+          name: "camonitor"
+          pvname: ["TEST:PV1", "TEST:PV2"]
+      - out_sqlite:
+          name: "out"
+          path: "./pv.db"
+          table: "pv"
+          src: "{{ fd.camonitor }}"
+          columns: ["name", "timestamp", "value"]
+    """
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        return {
+            "path": ArgSpec(type="path", required=True),
+            "table": ArgSpec(type="str", required=True),
+            "src": ArgSpec(type="any", required=True),
+            "columns": ArgSpec(type="list", required=False, default=None),
+            "batch_size": ArgSpec(type="int", required=False, default=1000),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+        }
+
+    async def process(self) -> None:
+        src = self.params["src"]
+        records = src if isinstance(src, list) else [src]
+        if not records:
+            return
+
+        columns = self.params["columns"]
+        if columns is None:
+            columns = list(records[0].keys())
+        rows = [tuple(_to_sql(r.get(c)) for c in columns) for r in records]
+
+        writer = get_writer(
+            Path(self.params["path"]),
+            batch_size=self.params["batch_size"],
+            flush_interval=self.params["flush_interval"],
+        )
+        writer.write(self.params["table"], tuple(columns), rows)
+
+
+@node.register("in_sqlite")
+class InSQLiteNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Run a query on SQLite database and pass the rows to the child node in batches.
+      description:
+        - Run a query on SQLite database and pass the rows to the child node in batches.
+        - Each row is output as a dict with column names as keys, and each batch is output as a list of the rows.
+        - The rows are fetched in a worker thread batch by batch, and the whole result is not loaded into memory.
+        - The child node is run for each batch, and is not run after all batches are passed.
+        - The database is opened in read-only mode.
+      parameters:
+        path:
+          description:
+            - The path of the SQLite database file.
+        query:
+          description:
+            - SQL query to run.
+        parameters:
+          description:
+            - List or dict of the parameters bound to the placeholders of the query.
+        batch_size:
+          description:
+            - The number of rows passed to the child node at once.
+            - If set to null, all rows are fetched and passed at once.
+    EXAMPLE: |-
+      # Read the PV data after the timestamp in blackboard
+      - in_sqlite:
+          name: "rows"
+          path: "./pv.db"
+          query: "SELECT name, timestamp, value FROM pv WHERE timestamp > ?"
+          parameters: ["{{ bb.last_timestamp }}"]
+          batch_size: 500
+      # Output: [{'name': 'TEST:PV1', 'timestamp': 1749196716.822903, 'value': 7.0}, ...]
+    """
+
+    # the child node is run in process() for each batch
+    async def run(self) -> None:
+        await self._run_self()
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        self.set_common_output_args()
+        return {
+            "path": ArgSpec(type="path", required=True),
+            "query": ArgSpec(type="str", required=True),
+            "parameters": ArgSpec(type="any", required=False, default=None),
+            "batch_size": ArgSpec(type="int", required=False, default=1000),
+        }
+
+    async def process(self) -> None:
+        path = Path(self.params["path"]).resolve()
+        parameters = self.params["parameters"] or ()
+        batch_size = self.params["batch_size"]
+        base_fd = ctx_flowdata.get()
+
+        # the connection is used by one worker thread at a time
+        conn = await asyncio.to_thread(
+            sqlite3.connect,
+            f"{path.as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        try:
+            cursor = await asyncio.to_thread(
+                conn.execute, self.params["query"], parameters
+            )
+            columns = [d[0] for d in cursor.description or []]
+            while rows := await asyncio.to_thread(_fetch, cursor, batch_size):
+                await self._emit(base_fd, [dict(zip(columns, r)) for r in rows])
+        finally:
+            await asyncio.to_thread(conn.close)
+            ctx_flowdata.set(base_fd)
+
+    async def _emit(self, base_fd: FlowData, data: Any) -> None:
+        ctx_flowdata.set(base_fd.fork())
+        self.output(data)
+        await self._run_child()
+
+
+def _fetch(cursor: sqlite3.Cursor, size: int | None) -> list:
+    if size is None:
+        return cursor.fetchall()
+    return cursor.fetchmany(size)
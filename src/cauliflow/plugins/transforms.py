@@ -1,6 +1,8 @@
-from copy import deepcopy
+from collections.abc import Callable
 from functools import singledispatchmethod
+from typing import Any
 
+from cauliflow.filters import FILTERS
 from cauliflow.node import ArgSpec, ProcessNode, node
 
 
@@ -95,36 +97,124 @@ class ConcatNode(ProcessNode):
 
 @node.register("mutate")
 class MutateNode(ProcessNode):
+    """
+    DOCUMENTATION:
+      short_description: Mutate fields of a dict or a list of dicts.
+      description:
+        - Mutate fields of a dict or a list of dicts.
+        - The operations are applied in the order of copy, rename, set, split, cast and delete in a single pass.
+        - The input data is not modified. Only the mutated dicts are copied, and the other data is shared with the input.
+      parameters:
+        target:
+          description:
+            - A dict or a list of dicts to be mutated.
+        copy:
+          description:
+            - Dict of source field and destination field to copy.
+            - The copied field shares the data with the source field.
+        rename:
+          description:
+            - Dict of old field name and new field name.
+        set:
+          description:
+            - Dict of field and value to set.
+        split:
+          description:
+            - Dict of field and separator to split the string of the field into a list.
+        cast:
+          description:
+            - Dict of field and filter name to convert the value of the field.
+            - For example, str, int, float and bool can be used.
+        delete:
+          description:
+            - List of fields to delete.
+    EXAMPLE: |-
+      # Copy the origin field to the pv field and split it.
+      # Output: {'mutate': [{'origin': 'head.pv1', 'pv': ['head', 'pv1']}, {'origin': 'head.pv2', 'pv': ['head', 'pv2']}]}
+      - mutate:
+          name: "mutate"
+          target: [{"origin": "head.pv1"}, {"origin": "head.pv2"}]
+          copy: {"origin": "pv"}
+          split: {"pv": "."}
+
+      # Rename, set, cast and delete the fields of a dict.
+      # Output: {'mutate': {'id': 1, 'value': 1.5, 'host': 'foo'}}
+      - mutate:
+          name: "mutate"
+          target: {"itemid": "1", "lastvalue": "1.5", "flags": 0}
+          rename: {"itemid": "id", "lastvalue": "value"}
+          set: {"host": "foo"}
+          cast: {"id": "int", "value": "float"}
+          delete: ["flags"]
+    """
+
     def set_argument_spec(self) -> dict[str, ArgSpec]:
         self.set_common_output_args()
         return {
             "target": ArgSpec(type="any", required=True),
             "split": ArgSpec(type="dict", required=False, default={}),
             "copy": ArgSpec(type="dict", required=False, default={}),
+            "rename": ArgSpec(type="dict", required=False, default={}),
+            "set": ArgSpec(type="dict", required=False, default={}),
+            "cast": ArgSpec(type="dict", required=False, default={}),
+            "delete": ArgSpec(type="list[str]", required=False, default=[]),
         }
 
     async def process(self) -> None:
         target = self.params["target"]
-        target = deepcopy(target)
-        self.apply(target)
-        self.output(target)
+        ops = self._make_ops()
+        self.output(self.apply(target, ops))
+
+    def _make_ops(self) -> list[tuple[Callable, Any, Any]]:
+        ops = []
+        for src, dst in self.params["copy"].items():
+            ops.append((_copy, src, dst))
+        for src, dst in self.params["rename"].items():
+            ops.append((_rename, src, dst))
+        for field, value in self.params["set"].items():
+            ops.append((_set, field, value))
+        for field, separator in self.params["split"].items():
+            ops.append((_split, field, separator))
+        for field, name in self.params["cast"].items():
+            if name not in FILTERS:
+                raise KeyError(f"{name} is not a valid filter")
+            ops.append((_cast, field, FILTERS[name]))
+        for field in self.params["delete"]:
+            ops.append((_delete, field, None))
+        return ops
 
     @singledispatchmethod
-    def apply(self, target: dict):
-        self.copy(target)
-        self.split(target)
+    def apply(self, target: dict, ops: list) -> dict:
+        # only the top level of the dict is copied, and the values are shared
+        out = dict(target)
+        for op, field, arg in ops:
+            op(out, field, arg)
+        return out
 
     @apply.register
-    def _(self, targets: list) -> None:
-        for target in targets:
-            self.apply(target)
-
-    def split(self, target) -> None:
-        split_dict = self.params["split"]
-        for field, parser in split_dict.items():
-            target[field] = target[field].split(parser)
-
-    def copy(self, target):
-        copy_dict = self.params["copy"]
-        for src, dst in copy_dict.items():
-            target[dst] = deepcopy(target[src])
+    def _(self, targets: list, ops: list) -> list:
+        return [self.apply(target, ops) for target in targets]
+
+
+def _copy(target: dict, src: Any, dst: Any) -> None:
+    target[dst] = target[src]
+
+
+def _rename(target: dict, src: Any, dst: Any) -> None:
+    target[dst] = target.pop(src)
+
+
+def _set(target: dict, field: Any, value: Any) -> None:
+    target[field] = value
+
+
+def _split(target: dict, field: Any, separator: str) -> None:
+    target[field] = target[field].split(separator)
+
+
+def _cast(target: dict, field: Any, func: Callable) -> None:
+    target[field] = func(target[field])
+
+
+def _delete(target: dict, field: Any, _: Any) -> None:
+    target.pop(field, None)
@@ -1,12 +1,263 @@
+import asyncio
+import time
+from dataclasses import dataclass
 from functools import singledispatchmethod
+from typing import Any
 
 from zabbix_utils import AsyncSender, AsyncZabbixAPI, ItemValue
+from zabbix_utils.exceptions import APIRequestError, ProcessingError
+from zabbix_utils.types import TrapperResponse
 
 from cauliflow.logging import get_logger
 from cauliflow.node import ArgSpec, ProcessNode, node
+from cauliflow.session import get_session
+from cauliflow.shutdown import register_shutdown
 
 _logger = get_logger(__name__)
 
+# messages of Zabbix API errors when the session is expired or invalid
+_AUTH_ERRORS = ("re-login", "Not authorized", "Not authorised")
+
+
+class ZabbixClient:
+    # A logged-in Zabbix API client shared by the nodes with the same URL and user.
+    # The session ID is kept after the request, and the client logs in again when
+    # the API reports that the session is expired.
+    def __init__(self, url: str, user: str, password: str):
+        self.url = url
+        self.user = user
+        self.password = password
+        self.loop = asyncio.get_running_loop()
+        self.session = get_session(url)
+        self.api: AsyncZabbixAPI | None = None
+        self.logged_in = False
+        self.lock = asyncio.Lock()
+
+    async def call(self, method: str, params: Any = None) -> Any:
+        await self._login()
+        try:
+            return await self._request(method, params)
+        except APIRequestError as e:
+            if not _is_auth_error(e):
+                raise
+            _logger.info(f"Zabbix API session for {self.user} is expired. Log in again")
+            await self._login(force=True)
+            return await self._request(method, params)
+
+    async def close(self) -> None:
+        if self.api is not None and self.logged_in:
+            await self.api.logout()
+        self.logged_in = False
+
+    async def _request(self, method: str, params: Any) -> Any:
+        response = await self.api.send_async_request(method, params)  # type: ignore
+        return response.get("result")
+
+    async def _login(self, force: bool = False) -> None:
+        async with self.lock:
+            if self.logged_in and not force:
+                return
+            if self.api is None:
+                # the API version is checked with a blocking request in the constructor
+                self.api = await asyncio.to_thread(
+                    AsyncZabbixAPI,
+                    url=self.url,
+                    client_session=self.session,
+                )
+            await self.api.login(user=self.user, password=self.password)
+            self.logged_in = True
+
+
+def _is_auth_error(error: APIRequestError) -> bool:
+    message = str(getattr(error, "data", "")) + str(error)
+    return any(m in message for m in _AUTH_ERRORS)
+
+
+# clients shared by all nodes, keyed by URL and user
+_clients: dict[tuple[str, str], ZabbixClient] = {}
+
+# logouts of the replaced clients
+_closing: set[asyncio.Task] = set()
+
+
+def get_client(url: str, user: str, password: str) -> ZabbixClient:
+    key = (url, user)
+    client = _clients.get(key)
+    # a client can be used only in the event loop where it was created
+    if (
+        client is None
+        or client.loop is not asyncio.get_running_loop()
+        or client.password != password
+    ):
+        if client is not None:
+            _close_later(client)
+        client = ZabbixClient(url, user, password)
+        _clients[key] = client
+        # registered after the HTTP session so that logout runs before it is closed
+        register_shutdown(close_clients)
+    return client
+
+
+async def close_clients() -> None:
+    loop = asyncio.get_running_loop()
+    closing = [task for task in _closing if task.get_loop() is loop]
+    if closing:
+        await asyncio.gather(*closing)
+    while _clients:
+        _, client = _clients.popitem()
+        if client.loop is not loop:
+            continue
+        await _close_client(client)
+
+
+def _close_later(client: ZabbixClient) -> None:
+    # The replaced client is logged out not to leave its session on the server.
+    # The client of another event loop cannot be used any more.
+    if client.loop is not asyncio.get_running_loop():
+        return
+    task = asyncio.create_task(_close_client(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def _close_client(client: ZabbixClient) -> None:
+    try:
+        await client.close()
+    except Exception:
+        _logger.exception(f"failed to log out from {client.url}")
+
+
+class ZabbixItemIndex:
+    # An in-memory table of Zabbix items indexed by host name and item key.
+    # The item.get API has no filter for the items changed since a time, so the
+    # index is refreshed by fetching only the item IDs, then the details of the
+    # new items. Removed items are dropped. The whole table is fetched again every
+    # full_refresh_interval to pick up the items changed in place.
+    def __init__(
+        self,
+        client: ZabbixClient,
+        filter: dict | None = None,
+        output: list[str] | None = None,
+        refresh_interval: float = 60,
+        full_refresh_interval: float = 3600,
+    ):
+        self.client = client
+        self.filter = filter
+        self.output = output
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.items: dict[str, dict] = {}
+        self.index: dict[tuple[str, str], dict] = {}
+        self.last_full_sync = 0.0
+        self.lock = asyncio.Lock()
+        self.task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self.task is not None:
+            return
+        # the first sync raises the error to the node
+        if not self.last_full_sync:
+            await self.sync(full=True)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def lookup(self, host: str, key: str) -> dict | None:
+        return self.index.get((host, key))
+
+    async def sync(self, full: bool = False) -> None:
+        async with self.lock:
+            if full or not self.last_full_sync:
+                self.items = {i["itemid"]: i for i in await self._get_items()}
+                self.last_full_sync = time.monotonic()
+            else:
+                ids = await self.client.call(
+                    "item.get", {"output": ["itemid"], "filter": self.filter}
+                )
+                current = {i["itemid"] for i in ids}
+                for itemid in self.items.keys() - current:
+                    del self.items[itemid]
+                new = list(current - self.items.keys())
+                if new:
+                    for item in await self._get_items(new):
+                        self.items[item["itemid"]] = item
+            self.index = {
+                (_host_of(item), item["key_"]): item for item in self.items.values()
+            }
+
+    def stop(self) -> None:
+        if self.task is None:
+            return
+        # the task of another event loop is gone with the loop
+        if self.task.get_loop() is asyncio.get_running_loop():
+            self.task.cancel()
+        self.task = None
+
+    async def close(self) -> None:
+        self.stop()
+
+    async def _get_items(self, itemids: list[str] | None = None) -> list[dict]:
+        output = self.output
+        # the index needs the ID and the key of the items
+        if output is not None:
+            output = list(dict.fromkeys([*output, "itemid", "key_"]))
+        params: dict[str, Any] = {
+            "output": output if output is not None else "extend",
+            "filter": self.filter,
+            "selectHosts": ["host"],
+        }
+        if itemids is not None:
+            params["itemids"] = itemids
+        return await self.client.call("item.get", params)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            elapsed = time.monotonic() - self.last_full_sync
+            try:
+                await self.sync(full=elapsed >= self.full_refresh_interval)
+            except Exception:
+                # the previous table is kept and used until the next refresh
+                _logger.exception(
+                    f"failed to refresh Zabbix items of {self.client.url}"
+                )
+
+
+def _host_of(item: dict) -> str:
+    hosts = item.get("hosts") or [{}]
+    return hosts[0].get("host", "")
+
+
+# item indexes shared by all nodes, keyed by URL, user and the settings
+_indexes: dict[tuple, ZabbixItemIndex] = {}
+
+
+def get_item_index(client: ZabbixClient, **kwargs) -> ZabbixItemIndex:
+    key = (client.url, client.user, *(_hashable(v) for v in kwargs.values()))
+    index = _indexes.get(key)
+    if index is None or index.client is not client:
+        # the index of the replaced client stops refreshing
+        if index is not None:
+            index.stop()
+        index = ZabbixItemIndex(client, **kwargs)
+        _indexes[key] = index
+        # registered after the client so that the refresh stops before logout
+        register_shutdown(close_item_indexes)
+    return index
+
+
+async def close_item_indexes() -> None:
+    while _indexes:
+        _, index = _indexes.popitem()
+        await index.close()
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
 
 @node.register("zabbix_get_item")
 class ZabbixGetItemNode(ProcessNode):
@@ -15,6 +266,11 @@ class ZabbixGetItemNode(ProcessNode):
       short_description: Get Zabbix item with Zabbix API
       description:
         - Get Zabbix item with Zabbix API
+        - The API client is shared by the nodes with the same URL and user. It logs in once and logs in again only when the session is expired.
+        - If cache is true, the items are held in a local table indexed by host name and item key, and the node reads the table instead of calling the API.
+        - The table is shared by the nodes with the same URL, user, filter and output, and refreshed in the background every refresh_interval.
+        - On refresh, only the item IDs and the details of the new items are fetched, and the removed items are dropped. All items are fetched again every full_refresh_interval to pick up the items changed in place.
+        - The items in the table have the hosts property with the host name.
       parameters:
         url:
           description:
@@ -31,6 +287,21 @@ class ZabbixGetItemNode(ProcessNode):
         output:
           description:
             - Properties to be returned.
+        cache:
+          description:
+            - If true, read the items from the local table.
+        lookup:
+          description:
+            - A dict with host and key, or a list of them, to look up in the local table.
+            - The matched item, or a list of them, is output. None is output for the item not found.
+            - If not set, all items in the table are output.
+            - Used only when cache is true.
+        refresh_interval:
+          description:
+            - The interval in second to refresh the local table.
+        full_refresh_interval:
+          description:
+            - The interval in second to fetch all items for the local table.
     EXAMPLE: |-
       # Get Zabbix items only matched Template EPICS
       # Output: [{'key_': 'item.key1',  'name': 'foo, 'itemid': 1}]
@@ -41,6 +312,20 @@ class ZabbixGetItemNode(ProcessNode):
           password: "Zabbix"
           output: ["itemid", "name", "key_"]
           filter: { "key_": null, "host": "Template EPICS" }
+
+      # Look up the items of the PVs in the local table
+      # Output: [{'key_': 'TEST:PV1', 'name': 'foo', 'itemid': 1, 'hosts': [{'hostid': '1', 'host': 'ioc1'}]}, None]
+      - zabbix_get_item:
+          name: "zabbix_get"
+          url: "http:/localhost"
+          user: "Admin"
+          password: "Zabbix"
+          output: ["itemid", "name", "key_"]
+          cache: true
+          refresh_interval: 60
+          lookup:
+            - { "host": "ioc1", "key": "TEST:PV1" }
+            - { "host": "ioc1", "key": "TEST:PV2" }
     """
 
     def set_argument_spec(self) -> dict[str, ArgSpec]:
@@ -51,19 +336,177 @@ class ZabbixGetItemNode(ProcessNode):
             "password": ArgSpec(type="str", required=False, default="Zabbix"),
             "filter": ArgSpec(type="dict", required=False, default=None),
             "output": ArgSpec(type="list[str]", required=False, default=None),
+            "cache": ArgSpec(type="bool", required=False, default=False),
+            "lookup": ArgSpec(type="dict|list[dict]", required=False, default=None),
+            "refresh_interval": ArgSpec(type="float", required=False, default=60),
+            "full_refresh_interval": ArgSpec(
+                type="float", required=False, default=3600
+            ),
         }
 
     async def process(self) -> None:
-        self.api = AsyncZabbixAPI(url=self.params["url"])
-        await self.api.login(user=self.params["user"], password=self.params["password"])
-
-        items = await self.api.item.get(  # type: ignore
-            output=self.params["output"], filter=self.params["filter"]
+        client = get_client(
+            self.params["url"], self.params["user"], self.params["password"]
         )
+        if self.params["cache"]:
+            await self._lookup(client)
+            return
 
-        await self.api.logout()
+        items = await client.call(
+            "item.get",
+            {"output": self.params["output"], "filter": self.params["filter"]},
+        )
         self.output(items)
 
+    async def _lookup(self, client: ZabbixClient) -> None:
+        index = get_item_index(
+            client,
+            filter=self.params["filter"],
+            output=self.params["output"],
+            refresh_interval=self.params["refresh_interval"],
+            full_refresh_interval=self.params["full_refresh_interval"],
+        )
+        await index.start()
+
+        lookup = self.params["lookup"]
+        if lookup is None:
+            self.output(list(index.items.values()))
+        elif isinstance(lookup, dict):
+            self.output(index.lookup(lookup["host"], lookup["key"]))
+        else:
+            self.output([index.lookup(q["host"], q["key"]) for q in lookup])
+
+
+@dataclass
+class SendStats:
+    batches: int = 0
+    processed: int = 0
+    failed: int = 0
+    total: int = 0
+    errors: int = 0
+
+
+class ZabbixBatchSender:
+    # Item values are accumulated across the node executions and sent as a batch
+    # when the number of the values reaches max_items or flush_interval has elapsed.
+    # A batch is split into packets of chunk_size values by AsyncSender, and up to
+    # max_inflight batches are sent in parallel.
+    def __init__(
+        self,
+        server: str,
+        port: int = 10051,
+        max_items: int = 1000,
+        flush_interval: float = 1.0,
+        chunk_size: int = 250,
+        max_inflight: int = 4,
+        timeout: int = 10,
+    ):
+        self.address = f"{server}:{port}"
+        self.max_items = max_items
+        self.flush_interval = flush_interval
+        self.sender = AsyncSender(
+            server=server, port=port, chunk_size=chunk_size, timeout=timeout
+        )
+        self.buffer: list[ItemValue] = []
+        self.semaphore = asyncio.Semaphore(max_inflight)
+        self.tasks: set[asyncio.Task] = set()
+        self.timer_task: asyncio.Task | None = None
+        self.sequence = 0
+        self.stats = SendStats()
+
+    async def add(self, items: list[ItemValue]) -> None:
+        self.buffer.extend(items)
+        if len(self.buffer) >= self.max_items:
+            await self.flush()
+        elif self.buffer and self.timer_task is None:
+            self.timer_task = asyncio.create_task(self._start_timer())
+
+    async def send(self, items: list[ItemValue]) -> TrapperResponse:
+        # send the items without buffering, and raise the error to the caller
+        async with self.semaphore:
+            return await self._deliver(self._next_sequence(), items)
+
+    async def flush(self) -> None:
+        if not self.buffer:
+            return
+        items = self.buffer
+        self.buffer = []
+        sequence = self._next_sequence()
+
+        # the caller waits here while max_inflight batches are in flight
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._send_batch(sequence, items))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self) -> None:
+        if self.timer_task is not None:
+            self.timer_task.cancel()
+            self.timer_task = None
+        await self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    def _next_sequence(self) -> int:
+        sequence = self.sequence
+        self.sequence += 1
+        return sequence
+
+    async def _start_timer(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self.timer_task = None
+        await self.flush()
+
+    async def _send_batch(self, sequence: int, items: list[ItemValue]) -> None:
+        try:
+            await self._deliver(sequence, items)
+        except (ProcessingError, OSError) as e:
+            _logger.warning(f"failed to send batch {sequence} to {self.address}: {e!r}")
+        finally:
+            self.semaphore.release()
+
+    async def _deliver(self, sequence: int, items: list[ItemValue]) -> TrapperResponse:
+        try:
+            response = await self.sender.send(items)
+        except BaseException:
+            self.stats.errors += 1
+            raise
+
+        self.stats.batches += 1
+        self.stats.processed += response.processed
+        self.stats.failed += response.failed
+        self.stats.total += response.total
+
+        message = (
+            f"batch {sequence} to {self.address}: processed {response.processed}, "
+            f"failed {response.failed}, total {response.total}"
+        )
+        if response.failed:
+            _logger.warning(message)
+        else:
+            _logger.debug(message)
+        return response
+
+
+# senders shared by all zabbix_send nodes with the same server and settings
+_senders: dict[tuple, ZabbixBatchSender] = {}
+
+
+def get_sender(server: str, port: int, **kwargs) -> ZabbixBatchSender:
+    key = (server, port, *kwargs.values())
+    sender = _senders.get(key)
+    if sender is None:
+        sender = ZabbixBatchSender(server, port, **kwargs)
+        _senders[key] = sender
+        register_shutdown(close_senders)
+    return sender
+
+
+async def close_senders() -> None:
+    while _senders:
+        _, sender = _senders.popitem()
+        await sender.close()
+
 
 @node.register("zabbix_send")
 class ZabbixSend(ProcessNode):
@@ -72,6 +515,10 @@ class ZabbixSend(ProcessNode):
       short_description: Send item values to a Zabbix server.
       description:
         - Send item values to a Zabbix server via Zabbix sender protocol.
+        - If batch_size is set, the item values are accumulated across the executions of the nodes with the same server and settings, and sent as a batch when the number of the values reaches batch_size or flush_interval has elapsed.
+        - When batching, the values without clock are timestamped when they are added, not when they are sent.
+        - A batch is sent as packets of chunk_size values, and up to max_inflight batches are sent in parallel.
+        - The numbers of the processed and failed values reported by the server are logged for each batch.
       parameters:
         server:
           description:
@@ -83,6 +530,23 @@ class ZabbixSend(ProcessNode):
           description:
             - List of items or dict of item to send.
             - "Item must have following keys: hostname, key, and value."
+            - "Item can have the optional keys: clock and ns."
+        batch_size:
+          description:
+            - The number of the item values to send at once.
+            - If not set, the item values are sent on each execution and the node waits for the response.
+        flush_interval:
+          description:
+            - The maximum time in second for the item values to stay in the buffer.
+        chunk_size:
+          description:
+            - The maximum number of the item values in a packet.
+        max_inflight:
+          description:
+            - The maximum number of the batches sent in parallel.
+        timeout:
+          description:
+            - The timeout in second for the connection to Zabbix server.
     EXAMPLE: |-
       # Send two items to Zabbix server.
       # Output: No output
@@ -99,6 +563,14 @@ class ZabbixSend(ProcessNode):
       - zabbix_send:
           name: "zabbix_send"
           items: "{{ fd.zabbix_item }}"
+
+      # Send items in batches of 1000 values at least once a second.
+      # Output: No output
+      - zabbix_send:
+          name: "zabbix_send"
+          items: "{{ fd.zabbix_item }}"
+          batch_size: 1000
+          flush_interval: 1.0
     """
 
     def set_argument_spec(self) -> dict[str, ArgSpec]:
@@ -106,24 +578,57 @@ class ZabbixSend(ProcessNode):
             "server": ArgSpec(type="str", required=False, default="localhost"),
             "port": ArgSpec(type="int", required=False, default=10051),
             "items": ArgSpec(type="dict|list[dict]", required=True),
+            "batch_size": ArgSpec(type="int", required=False, default=None),
+            "flush_interval": ArgSpec(type="float", required=False, default=1.0),
+            "chunk_size": ArgSpec(type="int", required=False, default=250),
+            "max_inflight": ArgSpec(type="int", required=False, default=4),
+            "timeout": ArgSpec(type="int", required=False, default=10),
         }
 
     async def process(self) -> None:
-        sender = AsyncSender(server=self.params["server"], port=self.params["port"])
+        batch_size = self.params["batch_size"]
+        sender = get_sender(
+            self.params["server"],
+            self.params["port"],
+            max_items=batch_size or 0,
+            flush_interval=self.params["flush_interval"],
+            chunk_size=self.params["chunk_size"],
+            max_inflight=self.params["max_inflight"],
+            timeout=self.params["timeout"],
+        )
 
         input = self.params["items"]
         items = self._create_items(input)
-        response = await sender.send(items)
-        _logger.debug(response)
+        if batch_size is None:
+            response = await sender.send(items)
+            _logger.debug(response)
+            return
+
+        _stamp(items)
+        await sender.add(items)
 
     @singledispatchmethod
     def _create_items(self, item: dict) -> list[ItemValue]:
-        return [ItemValue(item["hostname"], item["key"], item["value"])]
+        return [_to_item_value(item)]
 
     @_create_items.register
     def _(self, items: list) -> list[ItemValue]:
-        item_list = []
-        for item in items:
-            item_list.append(ItemValue(item["hostname"], item["key"], item["value"]))
+        return [_to_item_value(item) for item in items]
+
+
+def _to_item_value(item: dict) -> ItemValue:
+    return ItemValue(
+        item["hostname"],
+        item["key"],
+        item["value"],
+        clock=item.get("clock"),
+        ns=item.get("ns"),
+    )
+
 
-        return item_list
+def _stamp(items: list[ItemValue]) -> None:
+    # the server uses the time when the values are received if clock is not set
+    now = time.time_ns()
+    for item in items:
+        if item.clock is None:
+            item.clock, item.ns = divmod(now, 1_000_000_000)
@@ -0,0 +1,59 @@
+import asyncio
+from dataclasses import dataclass
+
+from aiohttp import ClientSession, TCPConnector
+from yarl import URL
+
+from cauliflow.shutdown import register_shutdown
+
+
+@dataclass(frozen=True)
+class SessionOptions:
+    limit: int = 100
+    limit_per_host: int = 0
+    dns_cache_ttl: int | None = 10
+    keepalive_timeout: float = 15.0
+
+
+# sessions shared by all nodes, keyed by the origin of the URL and the options
+_sessions: dict[
+    tuple[str, SessionOptions], tuple[asyncio.AbstractEventLoop, ClientSession]
+] = {}
+
+
+def get_session(url: str, options: SessionOptions | None = None) -> ClientSession:
+    options = options if options is not None else SessionOptions()
+    key = (_origin(url), options)
+    loop = asyncio.get_running_loop()
+
+    entry = _sessions.get(key)
+    # a session can be used only in the event loop where it was created
+    if entry is not None and entry[0] is loop and not entry[1].closed:
+        return entry[1]
+
+    connector = TCPConnector(
+        limit=options.limit,
+        limit_per_host=options.limit_per_host,
+        use_dns_cache=options.dns_cache_ttl is not None,
+        ttl_dns_cache=options.dns_cache_ttl,
+        keepalive_timeout=options.keepalive_timeout,
+    )
+    session = ClientSession(connector=connector)
+    _sessions[key] = (loop, session)
+    register_shutdown(close_sessions)
+    return session
+
+
+async def close_sessions() -> None:
+    loop = asyncio.get_running_loop()
+    while _sessions:
+        _, (session_loop, session) = _sessions.popitem()
+        if session_loop is loop:
+            await session.close()
+
+
+def _origin(url: str) -> str:
+    parsed = URL(url)
+    if not parsed.is_absolute():
+        return ""
+    return str(parsed.origin())
@@ -0,0 +1,22 @@
+from collections.abc import Awaitable, Callable
+
+from cauliflow.logging import get_logger
+
+_logger = get_logger(__name__)
+
+_callbacks: list[Callable[[], Awaitable[None]]] = []
+
+
+def register_shutdown(callback: Callable[[], Awaitable[None]]) -> None:
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+async def run_shutdown() -> None:
+    # resources are released in the reverse order of the registration
+    while _callbacks:
+        callback = _callbacks.pop()
+        try:
+            await callback()
+        except Exception:
+            _logger.exception(f"failed to shut down: {callback}")
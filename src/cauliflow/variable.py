@@ -218,17 +218,40 @@ class Variable:
         if not self.has_var:
             return self.val
 
-        bb = ctx_blackboard.get()
-        fd = ctx_flowdata.get()
-        mcr = ctx_macros.get()
-        vars = {"bb": bb, "fd": fd, "macro": mcr}
-        vars.update(extend)
-        transformer = OperatorTree(vars)
+        return self.evaluate(make_namespace(extend))
+
+    def evaluate(self, namespace: dict) -> Any:
+        if self.parse_tree is None:
+            return self.expression
+
+        if not self.has_var:
+            return self.val
+
+        transformer = OperatorTree(namespace)
         result = transformer.transform(self.parse_tree)
         return result
 
+    def var_names(self) -> set[str]:
+        if self.parse_tree is None:
+            return set()
+        return {
+            str(subtree.children[0])
+            for subtree in self.parse_tree.iter_subtrees()
+            if subtree.data == "var"
+        }
+
     def _find_var(self, tree: Tree):
         for subtree in tree.iter_subtrees():
             if subtree.data == "var":
                 return True
         return False
+
+
+def make_namespace(extend: dict | None = None) -> dict:
+    bb = ctx_blackboard.get()
+    fd = ctx_flowdata.get()
+    mcr = ctx_macros.get()
+    vars = {"bb": bb, "fd": fd, "macro": mcr}
+    if extend:
+        vars.update(extend)
+    return vars
@@ -0,0 +1,196 @@
+import operator
+from collections.abc import Callable
+from math import prod
+from typing import Any
+
+from lark import Token, Tree
+
+from cauliflow.variable import Variable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VectorFunc = Callable[[dict], Any]
+
+_BINARY_OPS: dict[str, Callable] = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "div": operator.truediv,
+    "floor": operator.floordiv,
+    "mod": operator.mod,
+    "lt": operator.lt,
+    "gt": operator.gt,
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "ge": operator.ge,
+    "le": operator.le,
+}
+
+# and/or are bitwise operators in the expressions
+_BITWISE_OPS: dict[str, Callable] = {
+    "and_": operator.and_,
+    "or_": operator.or_,
+}
+
+# operators whose results can exceed the range of int64
+_CHECKED_OPS = {"add", "sub", "mul", "floor", "mod", "neg"}
+
+# int items are vectorized only if they are exactly representable as float64
+_MAX_INT_ITEM = 2**53
+# int results are rejected above this with a margin for the float64 rounding
+_MAX_INT_RESULT = 2**62
+
+
+class Unsupported(Exception):
+    pass
+
+
+def compile_vectorized(variable: Variable, logical: bool = False) -> VectorFunc:
+    # The compiled function takes a dict of numpy columns of the loop items.
+    # not is compiled only for conditions, because the result is used as a mask.
+    if np is None:
+        raise Unsupported("numpy is not installed")
+
+    tree = variable.parse_tree
+    if tree is None or len(tree.children) != 1:
+        raise Unsupported("only a single expression can be vectorized")
+
+    wrapper = tree.children[0]
+    if not isinstance(wrapper, Tree) or wrapper.data != "expression_wrapper":
+        raise Unsupported("only a single expression can be vectorized")
+
+    return _compile(wrapper.children[0], logical)
+
+
+def _compile(tree: Tree | Token, logical: bool) -> VectorFunc:
+    if not isinstance(tree, Tree):
+        raise Unsupported(f"{tree} is not supported")
+
+    data = tree.data
+    children = tree.children
+
+    if data == "var":
+        name = str(children[0])
+        return lambda columns: _get_column(columns, name)
+
+    if data in ("integer", "float"):
+        value = int(children[0]) if data == "integer" else float(children[0])
+        return lambda columns: value
+
+    if data in ("true", "false"):
+        value = data == "true"
+        return lambda columns: value
+
+    if data == "neg":
+        operand = _compile(children[0], logical)
+        return lambda columns: _arithmetic(operator.neg, operand(columns))
+
+    if data in _BINARY_OPS:
+        op = _BINARY_OPS[data]
+        left = _compile(children[0], logical)
+        right = _compile(children[1], logical)
+        if data in _CHECKED_OPS:
+            return lambda columns: _arithmetic(op, left(columns), right(columns))
+        if data == "div":
+            return lambda columns: op(_to_int(left(columns)), _to_int(right(columns)))
+        return lambda columns: op(left(columns), right(columns))
+
+    if data in _BITWISE_OPS:
+        op = _BITWISE_OPS[data]
+        left = _compile(children[0], logical)
+        right = _compile(children[1], logical)
+        return lambda columns: _bitwise(op, left(columns), right(columns))
+
+    if data == "not_" and logical:
+        operand = _compile(children[0], logical)
+        return lambda columns: np.logical_not(operand(columns))
+
+    raise Unsupported(f"{data} is not supported")
+
+
+def _arithmetic(op: Callable, *operands: Any) -> Any:
+    # bool arrays are added as ints as same as Python
+    operands = tuple(_to_int(v) for v in operands)
+    try:
+        result = op(*operands)
+    except OverflowError as e:
+        raise Unsupported(e) from None
+
+    # int64 arithmetic wraps around silently, so the result is also computed
+    # with float64 and rejected if it can be out of the range of int64
+    if isinstance(result, np.ndarray) and result.dtype.kind in "iu":
+        shadow = op(*(np.asarray(v, dtype=np.float64) for v in operands))
+        if np.any(np.abs(shadow) >= _MAX_INT_RESULT):
+            raise Unsupported("integer overflow")
+    return result
+
+
+def _bitwise(op: Callable, left: Any, right: Any) -> Any:
+    # Python raises TypeError for floats
+    for operand in (left, right):
+        if isinstance(operand, float) or (
+            isinstance(operand, np.ndarray) and operand.dtype.kind == "f"
+        ):
+            raise Unsupported("bitwise operators are not supported for float")
+    return op(left, right)
+
+
+def _to_int(value: Any) -> Any:
+    if isinstance(value, np.ndarray) and value.dtype.kind == "b":
+        return value.astype(np.int64)
+    return value
+
+
+def _get_column(columns: dict, name: str) -> Any:
+    if name not in columns:
+        raise Unsupported(f"{name} is not a loop item")
+    return columns[name]
+
+
+def product_columns(loop_lists: list, names: set[str]) -> dict | None:
+    # Only the columns in names are created.
+    # None is returned if a column is not a list of int or a list of float.
+    levels = []
+    for depth, iterable in enumerate(loop_lists):
+        if isinstance(iterable, dict):
+            levels.append(
+                {
+                    f"item{depth}_key": list(iterable.keys()),
+                    f"item{depth}_val": list(iterable.values()),
+                }
+            )
+        elif isinstance(iterable, list):
+            levels.append({f"item{depth}": iterable})
+        else:
+            return None
+
+    sizes = [len(next(iter(level.values()))) for level in levels]
+    columns = {}
+    for depth, level in enumerate(levels):
+        inner = prod(sizes[depth + 1 :])
+        outer = prod(sizes[:depth])
+        for name, values in level.items():
+            if name not in names:
+                continue
+            array = _to_array(values)
+            if array is None:
+                return None
+            # the last loop varies fastest as same as itertools.product
+            columns[name] = np.tile(np.repeat(array, inner), outer)
+
+    return columns
+
+
+def _to_array(values: list) -> Any:
+    # mixed int and float are not vectorized to keep the types of the results
+    types = {type(v) for v in values}
+    if types == {int}:
+        if any(abs(v) > _MAX_INT_ITEM for v in values):
+            return None
+        return np.array(values, dtype=np.int64)
+    if types == {float}:
+        return np.array(values, dtype=np.float64)
+    return None
@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import pytest
+
+from cauliflow.context import ctx_blackboard, ctx_flowdata
+from cauliflow.node import Node
+from cauliflow.plugins import csv as csv_plugin
+from cauliflow.plugins.csv import InputCSVNode
+
+CSV_TEXT = "id, name\nfoo, John\nbar, Tom\n"
+
+
+@pytest.fixture
+def csv_path(tmpdir_factory):
+    fn = tmpdir_factory.mktemp("data").join("test.csv")
+    fn.write(CSV_TEXT)
+    return str(fn)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "format, expected",
+    [
+        ("array", [["id", "name"], ["foo", "John"], ["bar", "Tom"]]),
+        ("dict", [{"id": "foo", "name": "John"}, {"id": "bar", "name": "Tom"}]),
+        ("key_value", {"id": "name", "foo": "John", "bar": "Tom"}),
+    ],
+)
+async def test_in_csv(init_context_vars, csv_path, format, expected):
+    node = InputCSVNode(name="node", param_dict={"path": csv_path, "format": format})
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert flowdata["node"] == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "format, batch_size, expected",
+    [
+        ("array", None, [["id", "name"], ["foo", "John"], ["bar", "Tom"]]),
+        ("dict", None, [{"id": "foo", "name": "John"}, {"id": "bar", "name": "Tom"}]),
+        ("key_value", None, [{"id": "name"}, {"foo": "John"}, {"bar": "Tom"}]),
+        ("array", 2, [[["id", "name"], ["foo", "John"]], [["bar", "Tom"]]]),
+        ("key_value", 2, [{"id": "name", "foo": "John"}, {"bar": "Tom"}]),
+    ],
+)
+async def test_in_csv_stream(init_context_vars, csv_path, format, batch_size, expected):
+    params = {
+        "path": csv_path,
+        "format": format,
+        "stream": True,
+        "batch_size": batch_size,
+    }
+    node = InputCSVNode(name="node", param_dict=params)
+    received = []
+
+    class CollectNode(Node):
+        async def process(self) -> None:
+            received.append(ctx_flowdata.get()["node"])
+
+    node.add_child(CollectNode(name="collect", param_dict={}))
+    await node.run()
+
+    assert received == expected
+    assert "node" not in ctx_flowdata.get()
+
+
+@pytest.mark.asyncio
+async def test_in_csv_cache(init_context_vars, csv_path):
+    params = {"path": csv_path, "format": "dict", "out_bb": True, "cache": True}
+    node1 = InputCSVNode(name="node1", param_dict=params)
+    node2 = InputCSVNode(name="node2", param_dict=params)
+    await node1.run()
+    await node2.run()
+    bb = ctx_blackboard.get()
+    assert bb["node1"] is bb["node2"]
+
+    Path(csv_path).write_text(CSV_TEXT + "baz, Bob\n")
+
+    await node1.run()
+    assert bb["node1"] is not bb["node2"]
+    assert bb["node1"][-1] == {"id": "baz", "name": "Bob"}
+
+
+@pytest.mark.asyncio
+async def test_in_csv_no_cache_by_default(init_context_vars, csv_path):
+    params = {"path": csv_path, "format": "dict", "out_bb": True}
+    await InputCSVNode(name="node1", param_dict=params).run()
+    await InputCSVNode(name="node2", param_dict=params).run()
+    bb = ctx_blackboard.get()
+    assert bb["node1"] == bb["node2"]
+    assert bb["node1"] is not bb["node2"]
+
+
+@pytest.mark.asyncio
+async def test_in_csv_cache_size(init_context_vars, tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_plugin, "_CACHE_SIZE", 2)
+    monkeypatch.setattr(csv_plugin, "_cache", type(csv_plugin._cache)())
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.csv"
+        path.write_text(CSV_TEXT)
+        paths.append(path)
+        params = {"path": str(path), "format": "dict", "cache": True}
+        await InputCSVNode(name=f"node{i}", param_dict=params).run()
+
+    assert [key[0] for key in csv_plugin._cache] == [
+        str(p.resolve()) for p in paths[1:]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_in_csv_watch(init_context_vars, csv_path):
+    params = {"path": csv_path, "watch": True, "out_bb": True}
+    node = InputCSVNode(name="node", param_dict=params)
+    count = 0
+
+    class CountNode(Node):
+        async def process(self) -> None:
+            nonlocal count
+            count += 1
+
+    node.add_child(CountNode(name="count", param_dict={}))
+    await node.run()
+    await node.run()
+    assert count == 1
+
+    Path(csv_path).write_text(CSV_TEXT + "baz, Bob\n")
+
+    await node.run()
+    assert count == 2
+    assert ctx_blackboard.get()["node"]["baz"] == "Bob"
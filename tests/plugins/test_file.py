@@ -1,6 +1,18 @@
+import asyncio
+import gzip
+import json
+
+import numpy as np
 import pytest
 
-from cauliflow.plugins.file import OutFileNode
+from cauliflow.plugins.file import (
+    BufferedWriter,
+    OutFileNode,
+    OutFileRotatingNode,
+    OutJsonlNode,
+    zstd,
+)
+from cauliflow.shutdown import run_shutdown
 
 
 @pytest.mark.asyncio
@@ -21,3 +33,189 @@ async def test_output_file(init_context_vars, tmpdir_factory):
     with open(fn) as f:
         text = f.read()
     assert text == "hello\nhello\nhello\n"
+
+
+@pytest.mark.asyncio
+async def test_output_file_buffered(init_context_vars, tmpdir_factory):
+    fn = tmpdir_factory.mktemp("data").join("test.txt")
+    params = {"path": str(fn), "src": "hello", "buffer_size": 1024}
+
+    node1 = OutFileNode(name="node1", param_dict=params)
+    node2 = OutFileNode(name="node2", param_dict=params)
+    for _ in range(2):
+        await node1.run()
+        await node2.run()
+    assert not fn.exists() or fn.read() == ""
+
+    await run_shutdown()
+    assert fn.read() == "hello\n" * 4
+
+
+@pytest.mark.asyncio
+async def test_output_file_flush_interval(init_context_vars, tmpdir_factory):
+    fn = tmpdir_factory.mktemp("data").join("test.txt")
+    params = {
+        "path": str(fn),
+        "src": "hello",
+        "buffer_size": 1024,
+        "flush_interval": 0.1,
+        "fsync": "flush",
+    }
+
+    node = OutFileNode(name="node", param_dict=params)
+    await node.run()
+    await asyncio.sleep(0.3)
+    assert fn.read() == "hello\n"
+
+    await run_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_output_file_unbuffered_inline(init_context_vars, tmp_path, monkeypatch):
+    path = tmp_path / "test.txt"
+    writer = BufferedWriter(path)
+
+    async def to_thread(*args, **kwargs):
+        raise AssertionError("unbuffered data is written in place")
+
+    with monkeypatch.context() as m:
+        m.setattr(asyncio, "to_thread", to_thread)
+        await writer.write("hello\n")
+    assert path.read_text() == "hello\n"
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_output_file_flush_error(init_context_vars, tmp_path):
+    writer = BufferedWriter(
+        tmp_path / "missing" / "test.txt", buffer_size=1024, flush_interval=0.05
+    )
+    await writer.write("hello\n")
+    await asyncio.sleep(0.2)
+
+    # the error of the flush by the timer is raised on the next write
+    with pytest.raises(FileNotFoundError):
+        await writer.write("hello\n")
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_output_file_rotating_size(init_context_vars, tmpdir_factory):
+    dir = tmpdir_factory.mktemp("data")
+    params = {
+        "path": str(dir.join("archive.jsonl")),
+        "src": {"value": 1},
+        "serializer": "json",
+        "compression": "gzip",
+        "rotate_size": 20,
+        "buffer_size": 0,
+    }
+
+    node = OutFileRotatingNode(name="node", param_dict=params)
+    for _ in range(4):
+        await node.run()
+    await run_shutdown()
+
+    files = sorted(dir.listdir())
+    assert len(files) == 2
+    assert all(f.basename.startswith("archive.") for f in files)
+    assert all(f.basename.endswith(".jsonl.gz") for f in files)
+
+    lines = []
+    for f in files:
+        with gzip.open(f, mode="rt") as gz:
+            lines.extend(gz.read().splitlines())
+    assert [json.loads(line) for line in lines] == [{"value": 1}] * 4
+
+
+@pytest.mark.asyncio
+async def test_output_file_rotating_order(init_context_vars, tmpdir_factory):
+    dir = tmpdir_factory.mktemp("data")
+    params = {
+        "path": str(dir.join("archive.jsonl")),
+        "serializer": "json",
+        "compression": "gzip",
+        "rotate_size": 1,
+        "buffer_size": 0,
+    }
+
+    for i in range(12):
+        node = OutFileRotatingNode(name="node", param_dict={**params, "src": i})
+        await node.run()
+    await run_shutdown()
+
+    # the segments started in the same second are sorted in the order of writing
+    files = sorted(dir.listdir())
+    assert len(files) == 12
+    values = []
+    for f in files:
+        with gzip.open(f, mode="rt") as gz:
+            values.extend(json.loads(line) for line in gz.read().splitlines())
+    assert values == list(range(12))
+
+
+@pytest.mark.asyncio
+async def test_output_file_rotating_interval(init_context_vars, tmpdir_factory):
+    dir = tmpdir_factory.mktemp("data")
+    params = {
+        "path": str(dir.join("archive.txt")),
+        "src": "hello",
+        "compression": "none",
+        "rotate_interval": 0.1,
+        "buffer_size": 0,
+    }
+
+    node = OutFileRotatingNode(name="node", param_dict=params)
+    await node.run()
+    await asyncio.sleep(0.2)
+    await node.run()
+    await run_shutdown()
+
+    files = sorted(dir.listdir())
+    assert len(files) == 2
+    assert [f.read() for f in files] == ["hello\n", "hello\n"]
+
+
+@pytest.mark.skipif(zstd is None, reason="zstd is not available")
+@pytest.mark.asyncio
+async def test_output_file_rotating_zstd(init_context_vars, tmpdir_factory):
+    dir = tmpdir_factory.mktemp("data")
+    params = {
+        "path": str(dir.join("archive.txt")),
+        "src": "hello",
+        "compression": "zstd",
+        "fsync": "close",
+    }
+
+    node = OutFileRotatingNode(name="node", param_dict=params)
+    await node.run()
+    await node.run()
+    await run_shutdown()
+
+    files = dir.listdir()
+    assert len(files) == 1
+    assert files[0].basename.endswith(".txt.zst")
+    with zstd.open(files[0], mode="rt") as f:
+        assert f.read() == "hello\nhello\n"
+
+
+@pytest.mark.asyncio
+async def test_output_jsonl(init_context_vars, tmpdir_factory):
+    fn = tmpdir_factory.mktemp("data").join("test.jsonl")
+    records = [
+        {"name": "TEST:PV1", "value": np.float64(1.5), "ok": True},
+        {"name": "TEST:PV2", "value": np.array([1, 2, 3]), "ok": True},
+    ]
+    params = {"path": str(fn), "src": records, "split": True}
+
+    node = OutJsonlNode(name="node", param_dict=params)
+    await node.run()
+    await OutJsonlNode(name="node2", param_dict={"path": str(fn), "src": [1]}).run()
+    await run_shutdown()
+
+    lines = fn.read().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "TEST:PV1", "value": 1.5, "ok": True},
+        {"name": "TEST:PV2", "value": [1, 2, 3], "ok": True},
+        [1],
+    ]
@@ -1,7 +1,35 @@
+import asyncio
+
 import pytest
 
 from cauliflow.context import ctx_blackboard, ctx_flowdata
 from cauliflow.flow import Flow
+from cauliflow.node import ArgSpec, Node, node
+
+
+@node.register("test.sleepnode")
+class SleepNode(Node):
+    running = 0
+    max_running = 0
+
+    async def process(self) -> None:
+        cls = type(self)
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        try:
+            await asyncio.sleep(self.params["sleep"])
+        finally:
+            cls.running -= 1
+
+    def set_argument_spec(self) -> dict[str, ArgSpec]:
+        self.set_common_output_args()
+        return {"sleep": ArgSpec(type="float", required=True)}
+
+
+@node.register("test.timeouterrornode")
+class TimeoutErrorNode(Node):
+    async def process(self) -> None:
+        raise TimeoutError("timed out in the child")
 
 
 @pytest.mark.asyncio
@@ -81,6 +109,142 @@ async def test_foreach(init_plugins, mode):
     assert fd == {}
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "max_concurrency, chunk_size, expected",
+    [
+        (None, None, 10),
+        (3, None, 3),
+        (None, 4, 4),
+        (3, 2, 2),
+    ],
+)
+async def test_foreach_max_concurrency(
+    init_plugins, init_context_vars, max_concurrency, chunk_size, expected
+):
+    flow = Flow("test")
+
+    args_for = {
+        "items": list(range(10)),
+        "mode": "concurrent",
+        "max_concurrency": max_concurrency,
+        "chunk_size": chunk_size,
+    }
+    args_msg = {
+        "msg": "{{ fd.item }}",
+        "out_bb": True,
+        "out_field": "{{ 'field' + fd.item | str }}",
+    }
+
+    SleepNode.max_running = 0
+    flow.create_node("foreach", "root", "for", args_for)
+    flow.create_node("test.sleepnode", "for.child_for", "sleep", {"sleep": 0.01})
+    flow.create_node("message", "sleep", "msg", args_msg)
+
+    await flow.run()
+
+    assert SleepNode.max_running == expected
+    bb = ctx_blackboard.get()
+    assert all(bb[f"field{i}"] == i for i in range(10))
+
+
+@pytest.mark.asyncio
+async def test_foreach_timeout(init_plugins, init_context_vars):
+    flow = Flow("test")
+
+    args_for = {"items": [0.01, 1.0], "item_name": "sleep", "timeout": 0.2}
+    args_msg = {
+        "msg": "{{ fd.sleep }}",
+        "out_bb": True,
+        "out_field": "timeout",
+    }
+
+    flow.create_node("foreach", "root", "for", args_for)
+    flow.create_node(
+        "test.sleepnode", "for.child_for", "sleep", {"sleep": "{{ fd.sleep }}"}
+    )
+    flow.create_node("message", "sleep", "msg", args_msg)
+
+    await flow.run()
+
+    bb = ctx_blackboard.get()
+    assert bb["timeout"] == 0.01
+
+
+@pytest.mark.asyncio
+async def test_foreach_timeout_error_of_child(init_plugins, init_context_vars):
+    flow = Flow("test")
+
+    args_for = {"items": [1], "mode": "sequential", "timeout": 10}
+    flow.create_node("foreach", "root", "for", args_for)
+    flow.create_node("test.timeouterrornode", "for.child_for", "error", {})
+
+    with pytest.raises(TimeoutError, match="timed out in the child"):
+        await flow.run()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrency", [0, -1])
+async def test_foreach_invalid_max_concurrency(
+    init_plugins, init_context_vars, max_concurrency
+):
+    flow = Flow("test")
+
+    args_for = {
+        "items": [1, 2],
+        "mode": "concurrent",
+        "max_concurrency": max_concurrency,
+    }
+    flow.create_node("foreach", "root", "for", args_for)
+    flow.create_node("test.sleepnode", "for.child_for", "sleep", {"sleep": 0})
+
+    with pytest.raises(ValueError, match="max_concurrency"):
+        await flow.run()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mode, collect, collect_format, expected",
+    [
+        ("sequential", "add", "list", [2, 3, 4]),
+        ("concurrent", "add", "list", [2, 3, 4]),
+        ("concurrent", "add", "dict", {1: 2, 2: 3, 3: 4}),
+        (
+            "concurrent",
+            ["add", "none"],
+            "list",
+            [
+                {"add": 2, "none": None},
+                {"add": 3, "none": None},
+                {"add": 4, "none": None},
+            ],
+        ),
+    ],
+)
+async def test_foreach_collect(
+    init_plugins, init_context_vars, mode, collect, collect_format, expected
+):
+    flow = Flow("test")
+
+    args_for = {
+        "items": [1, 2, 3],
+        "mode": mode,
+        "collect": collect,
+        "collect_format": collect_format,
+    }
+    args_sleep = {"sleep": "{{ 0.03 - fd.item * 0.01 }}"}
+    args_add = {"a": "{{ fd.item }}", "b": 1}
+
+    flow.create_node("foreach", "root", "for", args_for)
+    flow.create_node("test.sleepnode", "for.child_for", "sleep", args_sleep)
+    flow.create_node("test.addnode", "sleep", "add", args_add)
+
+    await flow.run()
+
+    fd = ctx_flowdata.get()
+    assert fd == {"for": expected}
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "items, mode",
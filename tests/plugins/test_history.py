@@ -0,0 +1,42 @@
+import pytest
+
+from cauliflow.context import ctx_flowdata
+from cauliflow.plugins.history import InHistoryNode, OutHistoryNode
+from cauliflow.shutdown import run_shutdown
+
+
+@pytest.mark.asyncio
+async def test_history(init_context_vars, tmp_path):
+    records = [
+        {"name": "TEST:PV1", "value": float(i), "timestamp": float(i), "ok": True}
+        for i in range(5)
+    ]
+    records.append({"name": "TEST:PV2", "value": 10, "timestamp": 1.0, "ok": True})
+
+    node = OutHistoryNode(
+        name="out", param_dict={"directory": str(tmp_path), "src": records}
+    )
+    await node.run()
+
+    node = InHistoryNode(
+        name="in",
+        param_dict={"directory": str(tmp_path), "pvname": "TEST:PV1", "start": 1.0},
+    )
+    await node.run()
+    fd = ctx_flowdata.get()
+    assert fd["in"]["timestamp"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert fd["in"]["value"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    node = InHistoryNode(
+        name="in_list",
+        param_dict={
+            "directory": str(tmp_path),
+            "pvname": ["TEST:PV1", "TEST:PV2"],
+            "end": 1.0,
+        },
+    )
+    await node.run()
+    assert fd["in_list"]["TEST:PV1"]["value"].tolist() == [0.0, 1.0]
+    assert fd["in_list"]["TEST:PV2"]["value"].tolist() == [10.0]
+
+    await run_shutdown()
@@ -2,10 +2,24 @@ import asyncio
 import json
 
 import pytest
+import pytest_asyncio
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
 from aioresponses import CallbackResult, aioresponses
 
 from cauliflow.context import ctx_flowdata
-from cauliflow.plugins.http import HTTPNode
+from cauliflow.httpcache import get_cache
+from cauliflow.node import Node
+from cauliflow.plugins.http import (
+    BulkSender,
+    HTTPBulkNode,
+    HTTPFanoutNode,
+    HTTPListenNode,
+    HTTPNode,
+    HTTPStreamNode,
+)
+from cauliflow.session import get_session
+from cauliflow.shutdown import run_shutdown
 
 
 @pytest.fixture
@@ -14,6 +28,12 @@ def mock_aioresponse():
         yield m
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def close_sessions():
+    yield
+    await run_shutdown()
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "format, expected",
@@ -35,6 +55,42 @@ async def test_get_data(init_context_vars, mock_aioresponse, format, expected):
     assert data["data"] == expected
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "format, json_path, expected",
+    [
+        ("raw", None, b'{"result": {"items": [{"name": "foo"}]}}'),
+        ("json", "result.items", [{"name": "foo"}]),
+        ("json", "result.items.0.name", "foo"),
+        ("json", "result.items.-1.name", "foo"),
+        ("json", "result.items.1.name", None),
+        ("json", "result.unknown", None),
+    ],
+)
+async def test_get_data_json_path(
+    init_context_vars, mock_aioresponse, format, json_path, expected
+):
+    url = "http://example.com/api/data"
+    mock_aioresponse.get(url, body=b'{"result": {"items": [{"name": "foo"}]}}')
+
+    params = {"url": url, "format": format, "json_path": json_path}
+    node = HTTPNode(name="node", param_dict=params)
+    await node.run()
+    assert ctx_flowdata.get()["node"]["data"] == expected
+
+
+@pytest.mark.asyncio
+async def test_get_data_large_json(init_context_vars, mock_aioresponse):
+    url = "http://example.com/api/data"
+    payload = {"items": list(range(100000)), "total": 100000}
+    mock_aioresponse.get(url, payload=payload)
+
+    params = {"url": url, "format": "json", "json_path": "total"}
+    node = HTTPNode(name="node", param_dict=params)
+    await node.run()
+    assert ctx_flowdata.get()["node"]["data"] == 100000
+
+
 @pytest.mark.asyncio
 async def test_get_data_timeout(init_context_vars, mock_aioresponse):
     url = "http://example.com/api/data"
@@ -150,3 +206,333 @@ async def test_delete_data(init_context_vars, mock_aioresponse):
     flowdata = ctx_flowdata.get()
     data = flowdata["node"]
     assert data["status"] == 204
+
+
+@pytest.mark.asyncio
+async def test_shared_session(init_context_vars, mock_aioresponse):
+    url = "http://example.com/api/data"
+    mock_aioresponse.get(url, payload={"foo": "bar"})
+    mock_aioresponse.get(url + "2", payload={"foo": "bar"})
+
+    node1 = HTTPNode(name="node1", param_dict={"url": url})
+    node2 = HTTPNode(name="node2", param_dict={"url": url + "2"})
+    await node1.run()
+    await node2.run()
+
+    session = get_session(url)
+    assert get_session("http://example.com/other") is session
+    assert get_session("http://example.org/api") is not session
+
+    await run_shutdown()
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_fanout(init_context_vars, mock_aioresponse):
+    url = "http://example.com/api/"
+    running = 0
+    max_running = 0
+
+    async def request_callback(url, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return CallbackResult(status=200, payload={"path": url.path})
+
+    for i in range(10):
+        mock_aioresponse.get(f"{url}{i}", callback=request_callback)
+    mock_aioresponse.post(f"{url}post", payload={"path": "post"})
+    mock_aioresponse.get(f"{url}timeout", exception=TimeoutError())
+    mock_aioresponse.get(f"{url}invalid", body="not json")
+
+    requests = [f"{url}{i}" for i in range(10)]
+    requests.append({"url": f"{url}post", "method": "post", "body": "test"})
+    requests.append(f"{url}timeout")
+    requests.append(f"{url}invalid")
+    params = {"requests": requests, "format": "json", "max_concurrency": 3}
+    node = HTTPFanoutNode(name="node", param_dict=params)
+    await node.run()
+
+    results = ctx_flowdata.get()["node"]
+    assert max_running == 3
+    assert [r["url"] for r in results[:-3]] == [f"{url}{i}" for i in range(10)]
+    assert [r["data"]["path"] for r in results[:-3]] == [f"/api/{i}" for i in range(10)]
+    assert results[-3]["status"] == 200
+    assert results[-3]["data"] == {"path": "post"}
+    assert results[-2]["error"] == "TimeoutError"
+    assert results[-1]["error"].startswith("JSONDecodeError")
+    assert all(r["elapsed"] >= 0 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_get_data_cache(init_context_vars, mock_aioresponse):
+    url = "http://example.com/api/cached"
+    count = 0
+
+    def request_callback(url, **kwargs):
+        nonlocal count
+        count += 1
+        return CallbackResult(status=200, payload={"count": count})
+
+    mock_aioresponse.get(url, callback=request_callback, repeat=True)
+    get_cache().clear()
+
+    params = {"url": url, "format": "json", "cache": True}
+    nodes = [HTTPNode(name=f"node{i}", param_dict=params) for i in range(4)]
+    await asyncio.gather(*(node.run() for node in nodes[:3]))
+    await nodes[3].run()
+
+    flowdata = ctx_flowdata.get()
+    assert count == 1
+    assert all(flowdata[f"node{i}"]["data"] == {"count": 1} for i in range(4))
+
+
+@pytest.mark.asyncio
+async def test_post_data_cache(init_context_vars):
+    params = {"url": "http://example.com/api", "method": "post", "cache": True}
+    node = HTTPNode(name="node", param_dict=params)
+    with pytest.raises(ValueError):
+        await node.run()
+
+
+async def _start_server(handler):
+    app = web.Application()
+    app.router.add_get("/stream", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_stream_ndjson(init_context_vars):
+    async def handler(request):
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        for i in range(3):
+            await resp.write(json.dumps({"value": i}).encode() + b"\n")
+            await asyncio.sleep(0.01)
+        await resp.write(b"invalid\n")
+        await resp.write(b"\xff\xfe\n")
+        await resp.write(b"x" * 2**17 + b"\n")
+        await resp.write(json.dumps({"value": 3}).encode() + b"\n")
+        return resp
+
+    server = await _start_server(handler)
+    received = []
+
+    class CollectNode(Node):
+        async def process(self) -> None:
+            received.append(ctx_flowdata.get()["node"])
+
+    params = {"url": str(server.make_url("/stream")), "max_retries": 0}
+    node = HTTPStreamNode(name="node", param_dict=params)
+    node.add_child(CollectNode(name="collect", param_dict={}))
+    await node.run()
+    await server.close()
+
+    assert received == [{"value": 0}, {"value": 1}, {"value": 2}, {"value": 3}]
+
+
+@pytest.mark.asyncio
+async def test_stream_sse_reconnect(init_context_vars, monkeypatch):
+    last_event_ids = []
+    delays = []
+    sleep = asyncio.sleep
+
+    async def record_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        return await sleep(delay, *args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+
+    async def handler(request):
+        last_event_ids.append(request.headers.get("Last-Event-ID"))
+        start = len(last_event_ids) * 10
+        if start > 20:
+            return web.Response(status=503)
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b"retry: 10\n: comment\n\n")
+        for i in range(start, start + 2):
+            await resp.write(
+                f'id: {i}\nevent: update\ndata: {{"value": {i}}}\n\n'.encode()
+            )
+        return resp
+
+    server = await _start_server(handler)
+    received = []
+
+    class CollectNode(Node):
+        async def process(self) -> None:
+            received.append(ctx_flowdata.get()["node"])
+
+    params = {
+        "url": str(server.make_url("/stream")),
+        "format": "sse",
+        "json_data": True,
+        "batch_size": 10,
+        "batch_interval": 0.2,
+        "max_retries": 1,
+    }
+    node = HTTPStreamNode(name="node", param_dict=params)
+    node.add_child(CollectNode(name="collect", param_dict={}))
+    await node.run()
+    await server.close()
+
+    assert last_event_ids == [None, "11", "21"]
+    assert [d for d in delays if d] == [0.01, 0.01]
+    events = [e for batch in received for e in batch]
+    assert [e["data"]["value"] for e in events] == [10, 11, 20, 21]
+    assert events[0] == {"event": "update", "data": {"value": 10}, "id": "10"}
+
+
+async def _wait_listening(node):
+    while not node.addresses:
+        await asyncio.sleep(0.01)
+    host, port = node.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+
+@pytest.mark.asyncio
+async def test_listen(init_context_vars):
+    received = []
+    release = asyncio.Event()
+
+    class CollectNode(Node):
+        async def process(self) -> None:
+            data = ctx_flowdata.get()["node"]
+            if data == "block":
+                await release.wait()
+            received.append(data)
+
+    params = {"port": 0, "path": "/events", "max_inflight": 1}
+    node = HTTPListenNode(name="node", param_dict=params)
+    node.add_child(CollectNode(name="collect", param_dict={}))
+    task = asyncio.create_task(node.run())
+    url = await _wait_listening(node)
+
+    async with ClientSession() as session:
+        async with session.post(f"{url}/events", json={"value": 1}) as resp:
+            assert resp.status == 200
+            assert await resp.json() == {"accepted": 1}
+        async with session.post(f"{url}/events", json=[1, 2, 3]) as resp:
+            assert await resp.json() == {"accepted": 3}
+        async with session.post(f"{url}/events", data=b"invalid") as resp:
+            assert resp.status == 400
+
+        blocked = asyncio.create_task(session.post(f"{url}/events", json="block"))
+        while node.stats.inflight == 0:
+            await asyncio.sleep(0.01)
+        async with session.post(f"{url}/events", json={"value": 2}) as resp:
+            assert resp.status == 429
+        release.set()
+        async with await blocked as resp:
+            assert resp.status == 200
+
+        async with session.get(f"{url}/stats") as resp:
+            stats = await resp.json()
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert received == [{"value": 1}, 1, 2, 3, "block"]
+    assert stats["requests"] == 5
+    assert stats["accepted"] == 5
+    assert stats["rejected"] == 1
+    assert stats["errors"] == 1
+    assert stats["avg_latency"] > 0
+
+
+@pytest.mark.asyncio
+async def test_bulk(init_context_vars):
+    bodies = []
+
+    async def handler(request):
+        # the server decompresses the body of Content-Encoding: gzip
+        assert request.headers["Content-Encoding"] == "gzip"
+        body = await request.read()
+        bodies.append((int(request.headers["X-Batch-Sequence"]), body))
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_post("/ingest", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    params = {
+        "url": str(server.make_url("/ingest")),
+        "format": "ndjson",
+        "gzip": True,
+        "max_count": 3,
+        "max_inflight": 2,
+    }
+    node = HTTPBulkNode(name="node", param_dict={**params, "src": [0, 1]})
+    await node.run()
+    assert bodies == []
+    for i in range(2, 7):
+        node = HTTPBulkNode(name="node", param_dict={**params, "src": {"value": i}})
+        await node.run()
+    await run_shutdown()
+    await server.close()
+
+    assert sorted(bodies) == [
+        (0, b'0\n1\n{"value":2}\n'),
+        (1, b'{"value":3}\n{"value":4}\n{"value":5}\n'),
+        (2, b'{"value":6}\n'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_close_waits_for_timer_flush(init_context_vars):
+    bodies = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        bodies.append(await request.json())
+        await release.wait()
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_post("/ingest", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    sender = BulkSender(
+        str(server.make_url("/ingest")),
+        max_count=2,
+        flush_interval=0.01,
+        max_inflight=1,
+    )
+    await sender.add([1, 2])
+    await sender.add([3])
+    # the timer has taken [3] and waits for the first batch to complete
+    await asyncio.sleep(0.05)
+    assert sender.buffer == []
+
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    await sender.close()
+    await server.close()
+
+    assert bodies == [[1, 2], [3]]
+    assert sender.stats.batches == 2
+    assert sender.stats.acked == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_flush_interval(init_context_vars, mock_aioresponse):
+    url = "http://example.com/api/ingest"
+    bodies = []
+
+    def request_callback(url, **kwargs):
+        bodies.append(json.loads(kwargs["data"]))
+        return CallbackResult(status=200)
+
+    mock_aioresponse.post(url, callback=request_callback, repeat=True)
+
+    params = {"url": url, "src": [{"a": 1}, {"b": 2}], "flush_interval": 0.05}
+    await HTTPBulkNode(name="node", param_dict=params).run()
+    await asyncio.sleep(0.2)
+    assert bodies == [[{"a": 1}, {"b": 2}]]
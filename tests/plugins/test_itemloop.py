@@ -1,7 +1,12 @@
+from collections.abc import Iterator
+
 import pytest
+from lark.exceptions import VisitError
 
 from cauliflow.context import ctx_flowdata
+from cauliflow.plugins import itemloop
 from cauliflow.plugins.itemloop import ForDict, ForList
+from cauliflow.shutdown import run_shutdown
 
 
 @pytest.mark.asyncio
@@ -81,3 +86,125 @@ async def test_for_dict(init_context_vars, lists, key, val, filter, expected):
     await node.run()
     flowdata = ctx_flowdata.get()
     assert flowdata["node"] == expected
+
+
+@pytest.mark.asyncio
+async def test_for_list_process(init_context_vars):
+    fd = ctx_flowdata.get()
+    fd["head"] = "pv:"
+    params = {
+        "lists": [list(range(10)), ["a", "b"]],
+        "expression": "fd.head + item0 | str + item1",
+        "filter": "item0 == 3",
+        "executor": "process",
+        "workers": 3,
+    }
+    node = ForList(name="node", param_dict=params)
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert flowdata["node"] == [
+        f"pv:{i}{c}" for i in range(10) if i != 3 for c in ["a", "b"]
+    ]
+
+    pool = itemloop._process_pool
+    await run_shutdown()
+    assert itemloop._process_pool is None
+    with pytest.raises(RuntimeError):
+        pool.submit(int)
+
+
+@pytest.mark.asyncio
+async def test_for_dict_process(init_context_vars):
+    params = {
+        "lists": {f"key{i}": i for i in range(10)},
+        "key": "item0_key",
+        "val": "item0_val * 2",
+        "executor": "process",
+        "workers": 4,
+    }
+    node = ForDict(name="node", param_dict=params)
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert list(flowdata["node"].items()) == [(f"key{i}", i * 2) for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_for_list_stream(init_context_vars):
+    params = {
+        "lists": [[1, 2], {"a": 3, "b": 4}],
+        "expression": "item0 * item1_val",
+        "filter": "item1_key == 'a'",
+        "stream": True,
+    }
+    node = ForList(name="node", param_dict=params)
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert isinstance(flowdata["node"], Iterator)
+    assert list(flowdata["node"]) == [4, 8]
+
+
+@pytest.mark.asyncio
+async def test_for_dict_stream(init_context_vars):
+    params = {
+        "lists": [["a", "b"], [1, 2]],
+        "key": "item0 + item1 | str",
+        "val": "item1",
+        "stream": True,
+    }
+    node = ForDict(name="node", param_dict=params)
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert dict(flowdata["node"]) == {"a1": 1, "a2": 2, "b1": 1, "b2": 2}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "lists, expression, filter, expected, vectorized",
+    [
+        ([[1, 2], [3, 4]], "item0*item1", "item0*item1>7", [3, 4, 6], True),
+        ([1, 2, 3, 4], "-item0 // 2", "item0 == 1 or item0 > 3", [-1, -2], True),
+        ([1.0, 2.0], "item0 / 4", None, [0.25, 0.5], True),
+        ({"a": 1, "b": 2}, "item0_val % 2 == 0", None, [False, True], True),
+        # and/or are bitwise
+        ([1, 2, 3, 4], "item0", "item0 and 2", [1, 4], True),
+        ([1, 2, 3, 4], "item0 or 2", None, [3, 2, 3, 6], True),
+        ([1, 2, 3], "(item0 > 1) + (item0 > 2)", None, [0, 1, 2], True),
+        # fall back to per-item evaluation
+        ([1, 2.0], "item0 * 2", None, [2, 4.0], False),
+        (["a", "b"], "item0 + 'c'", None, ["ac", "bc"], False),
+        ([1, 2], "item0 | str", None, ["1", "2"], False),
+        ([2**62, 3], "item0*4", None, [2**64, 12], False),
+        ([2**40, 3], "item0*item0", None, [2**80, 9], False),
+        ([1.0, 2.0], "item0 and 1", None, None, False),
+    ],
+)
+async def test_for_list_vectorize(
+    init_context_vars, monkeypatch, lists, expression, filter, expected, vectorized
+):
+    params = {
+        "lists": lists,
+        "expression": expression,
+        "filter": filter,
+        "vectorize": True,
+    }
+    node = ForList(name="node", param_dict=params)
+    if vectorized:
+
+        def fail(*args):
+            raise AssertionError("items are evaluated one by one")
+
+        monkeypatch.setattr(node, "_iter_results", fail)
+
+    if expected is None:
+        # the error of the per-item evaluation is raised
+        with pytest.raises(VisitError) as exc_info:
+            await node.run()
+        assert isinstance(exc_info.value.orig_exc, TypeError)
+        return
+
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert flowdata["node"] == expected
+    assert [type(v) for v in flowdata["node"]] == [type(v) for v in expected]
+    if vectorized:
+        assert node.vector_funcs
@@ -0,0 +1,130 @@
+import asyncio
+import sqlite3
+
+import numpy as np
+import pytest
+
+from cauliflow.context import ctx_flowdata
+from cauliflow.node import Node
+from cauliflow.plugins import sqlite
+from cauliflow.plugins.sqlite import InSQLiteNode, OutSQLiteNode
+from cauliflow.shutdown import run_shutdown
+
+
+def _select(path, query):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(query).fetchall()
+
+
+@pytest.mark.asyncio
+async def test_out_sqlite(init_context_vars, tmp_path):
+    path = tmp_path / "test.db"
+    records = [
+        {"name": "TEST:PV1", "value": np.float64(1.5), "tags": ["a"]},
+        {"name": "TEST:PV2", "value": 2, "tags": []},
+    ]
+    params = {"path": str(path), "table": "pv", "src": records, "batch_size": 100}
+    node = OutSQLiteNode(name="node", param_dict=params)
+    await node.run()
+    await node.run()
+    await run_shutdown()
+
+    rows = _select(path, "SELECT name, value, tags FROM pv")
+    assert rows == [("TEST:PV1", 1.5, '["a"]'), ("TEST:PV2", 2, "[]")] * 2
+
+
+@pytest.mark.asyncio
+async def test_out_sqlite_table_error(init_context_vars, tmp_path):
+    path = tmp_path / "test.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE bad (other)")
+    conn.close()
+
+    for table in ("bad", "pv"):
+        params = {
+            "path": str(path),
+            "table": table,
+            "src": {"name": "TEST:PV1"},
+            "batch_size": 100,
+        }
+        await OutSQLiteNode(name=f"node_{table}", param_dict=params).run()
+    await run_shutdown()
+
+    # the rows of the other table are committed
+    assert _select(path, "SELECT name FROM pv") == [("TEST:PV1",)]
+    assert _select(path, "SELECT * FROM bad") == []
+
+
+@pytest.mark.asyncio
+async def test_out_sqlite_connect_error(init_context_vars, tmp_path):
+    params = {"path": str(tmp_path / "missing" / "test.db"), "table": "pv", "src": {}}
+    node = OutSQLiteNode(name="node", param_dict=params)
+    with pytest.raises(sqlite3.OperationalError):
+        await node.run()
+    assert not sqlite._writers
+
+
+@pytest.mark.asyncio
+async def test_out_sqlite_writer_stopped(init_context_vars, tmp_path):
+    writer = sqlite.get_writer(tmp_path / "test.db")
+    # an invalid item stops the writer thread
+    writer.queue.put(object())
+    await asyncio.to_thread(writer.thread.join)
+
+    with pytest.raises(RuntimeError):
+        writer.write("pv", ("name",), [("TEST:PV1",)])
+    with pytest.raises(RuntimeError):
+        await writer.close()
+    sqlite._writers.clear()
+
+
+@pytest.mark.asyncio
+async def test_out_sqlite_flush_interval(init_context_vars, tmp_path):
+    path = tmp_path / "test.db"
+    params = {
+        "path": str(path),
+        "table": "pv",
+        "src": {"name": "TEST:PV1", "value": 1.0, "extra": "x"},
+        "columns": ["name", "value"],
+        "flush_interval": 0.1,
+    }
+    node = OutSQLiteNode(name="node", param_dict=params)
+    await node.run()
+    await asyncio.sleep(0.5)
+    assert _select(path, "SELECT * FROM pv") == [("TEST:PV1", 1.0)]
+    await run_shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "batch_size, expected",
+    [
+        (2, [[{"id": 1}, {"id": 2}], [{"id": 3}]]),
+        (None, [[{"id": 1}, {"id": 2}, {"id": 3}]]),
+    ],
+)
+async def test_in_sqlite(init_context_vars, tmp_path, batch_size, expected):
+    path = tmp_path / "test.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,), (3,), (4,)])
+    conn.close()
+
+    params = {
+        "path": str(path),
+        "query": "SELECT id FROM t WHERE id < ? ORDER BY id",
+        "parameters": [4],
+        "batch_size": batch_size,
+    }
+    node = InSQLiteNode(name="node", param_dict=params)
+    received = []
+
+    class CollectNode(Node):
+        async def process(self) -> None:
+            received.append(ctx_flowdata.get()["node"])
+
+    node.add_child(CollectNode(name="collect", param_dict={}))
+    await node.run()
+
+    assert received == expected
+    assert "node" not in ctx_flowdata.get()
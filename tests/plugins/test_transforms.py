@@ -23,6 +23,32 @@ async def test_mutate(init_context_vars):
     ]
 
 
+@pytest.mark.asyncio
+async def test_mutate_operations(init_context_vars):
+    nested = {"unit": "mA"}
+    target = [
+        {"itemid": "1", "lastvalue": "1.5", "flags": 0, "tags": nested},
+        {"itemid": "2", "lastvalue": "2.5", "flags": 0, "tags": nested},
+    ]
+    params = {
+        "target": target,
+        "rename": {"itemid": "id", "lastvalue": "value"},
+        "set": {"host": "foo"},
+        "cast": {"id": "int", "value": "float"},
+        "delete": ["flags"],
+    }
+    node = MutateNode(name="node", param_dict=params)
+    await node.run()
+    flowdata = ctx_flowdata.get()
+    assert flowdata["node"] == [
+        {"id": 1, "value": 1.5, "host": "foo", "tags": {"unit": "mA"}},
+        {"id": 2, "value": 2.5, "host": "foo", "tags": {"unit": "mA"}},
+    ]
+    # the input is not modified and the untouched data is shared
+    assert target[0] == {"itemid": "1", "lastvalue": "1.5", "flags": 0, "tags": nested}
+    assert flowdata["node"][0]["tags"] is nested
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "params, expected",
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import struct
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from cauliflow.context import ctx_flowdata
+from cauliflow.plugins import zabbix
+from cauliflow.plugins.zabbix import ZabbixGetItemNode, ZabbixSend, get_sender
+from cauliflow.shutdown import run_shutdown
+
+ITEMS = [{"itemid": "1", "name": "foo", "key_": "item.key1", "host": "bar"}]
+
+
+class FakeZabbixAPI:
+    def __init__(self):
+        self.sessions: set[str] = set()
+        self.calls: list[str] = []
+        self.items = list(ITEMS)
+        self.item_requests: list[dict] = []
+
+    async def handle(self, request):
+        body = await request.json()
+        method = body["method"]
+        self.calls.append(method)
+
+        match method:
+            case "apiinfo.version":
+                return self._result(body, "7.0.0")
+            case "user.login":
+                session = f"session{len(self.sessions)}"
+                self.sessions.add(session)
+                return self._result(body, session)
+
+        auth = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if auth not in self.sessions:
+            return web.json_response(
+                {
+                    "jsonrpc": "2.0",
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params.",
+                        "data": "Session terminated, re-login, please.",
+                    },
+                    "id": body["id"],
+                }
+            )
+
+        match method:
+            case "item.get":
+                return self._result(body, self._get_items(body["params"]))
+            case "user.logout":
+                self.sessions.discard(auth)
+                return self._result(body, True)
+
+    def _get_items(self, params):
+        self.item_requests.append(params)
+        items = self.items
+        if "itemids" in params:
+            items = [i for i in items if i["itemid"] in params["itemids"]]
+        if params.get("output") == ["itemid"]:
+            return [{"itemid": i["itemid"]} for i in items]
+        if "selectHosts" in params:
+            items = [{**i, "hosts": [{"host": i["host"]}]} for i in items]
+        return items
+
+    def _result(self, body, result):
+        return web.json_response({"jsonrpc": "2.0", "result": result, "id": body["id"]})
+
+
+@pytest_asyncio.fixture
+async def zabbix_server():
+    api = FakeZabbixAPI()
+    app = web.Application()
+    app.router.add_post("/api_jsonrpc.php", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield api, str(server.make_url("/api_jsonrpc.php"))
+    await run_shutdown()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_get_item_reuse_session(init_context_vars, zabbix_server):
+    api, url = zabbix_server
+    params = {"url": url, "user": "Admin", "password": "zabbix"}
+
+    for i in range(3):
+        node = ZabbixGetItemNode(name=f"node{i}", param_dict=params)
+        await node.run()
+        assert ctx_flowdata.get()[f"node{i}"] == ITEMS
+
+    assert api.calls.count("user.login") == 1
+    assert api.calls.count("item.get") == 3
+
+    # the session is expired on the server
+    api.sessions.clear()
+    node = ZabbixGetItemNode(name="node3", param_dict=params)
+    await node.run()
+    assert ctx_flowdata.get()["node3"] == ITEMS
+    assert api.calls.count("user.login") == 2
+
+    await run_shutdown()
+    assert api.calls[-1] == "user.logout"
+    assert not api.sessions
+
+
+@pytest.mark.asyncio
+async def test_get_item_password_changed(init_context_vars, zabbix_server):
+    api, url = zabbix_server
+    for i, password in enumerate(["zabbix", "changed"]):
+        params = {"url": url, "user": "Admin", "password": password}
+        await ZabbixGetItemNode(name=f"node{i}", param_dict=params).run()
+
+    # the session of the replaced client is logged out
+    await asyncio.sleep(0.1)
+    assert api.calls.count("user.login") == 2
+    assert api.calls.count("user.logout") == 1
+    assert len(api.sessions) == 1
+
+    await run_shutdown()
+    assert not api.sessions
+
+
+@pytest.mark.asyncio
+async def test_get_item_cache_lookup(init_context_vars, zabbix_server):
+    api, url = zabbix_server
+    params = {
+        "url": url,
+        "user": "Admin",
+        "password": "zabbix",
+        "cache": True,
+        "lookup": [{"host": "bar", "key": "item.key1"}, {"host": "bar", "key": "x"}],
+    }
+
+    for i in range(3):
+        node = ZabbixGetItemNode(name=f"node{i}", param_dict=params)
+        await node.run()
+        found, missing = ctx_flowdata.get()[f"node{i}"]
+        assert found["itemid"] == "1"
+        assert missing is None
+
+    # the table is fetched once and looked up locally
+    assert api.calls.count("item.get") == 1
+
+
+@pytest.mark.asyncio
+async def test_get_item_cache_client_replaced(init_context_vars, zabbix_server):
+    _, url = zabbix_server
+    params = {"url": url, "user": "Admin", "cache": True, "refresh_interval": 0.05}
+
+    old = ZabbixGetItemNode(name="node0", param_dict={**params, "password": "a"})
+    await old.run()
+    index = next(iter(zabbix._indexes.values()))
+    task = index.task
+
+    new = ZabbixGetItemNode(name="node1", param_dict={**params, "password": "b"})
+    await new.run()
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
+    assert len(zabbix._indexes) == 1
+    assert next(iter(zabbix._indexes.values())) is not index
+
+
+@pytest.mark.asyncio
+async def test_get_item_cache_incremental_refresh(init_context_vars, zabbix_server):
+    api, url = zabbix_server
+    params = {
+        "url": url,
+        "user": "Admin",
+        "password": "zabbix",
+        "cache": True,
+        "refresh_interval": 0.05,
+        "lookup": {"host": "bar", "key": "item.key2"},
+    }
+
+    node = ZabbixGetItemNode(name="node0", param_dict=params)
+    await node.run()
+    assert ctx_flowdata.get()["node0"] is None
+
+    api.items = [{"itemid": "2", "name": "baz", "key_": "item.key2", "host": "bar"}]
+    await asyncio.sleep(0.2)
+
+    node = ZabbixGetItemNode(name="node1", param_dict=params)
+    await node.run()
+    assert ctx_flowdata.get()["node1"]["itemid"] == "2"
+
+    # only the new item is fetched with the details, and the removed item is dropped
+    assert {"itemids": ["2"]}.items() <= api.item_requests[2].items()
+    node = ZabbixGetItemNode(
+        name="node2",
+        param_dict={**params, "lookup": {"host": "bar", "key": "item.key1"}},
+    )
+    await node.run()
+    assert ctx_flowdata.get()["node2"] is None
+
+
+class FakeTrapper:
+    def __init__(self, fail_key: str | None = None):
+        self.packets: list[list[dict]] = []
+        self.fail_key = fail_key
+
+    async def handle(self, reader, writer):
+        header = await reader.readexactly(13)
+        _, _, datalen, _ = struct.unpack("<4sBII", header)
+        request = json.loads(await reader.readexactly(datalen))
+        items = request["data"]
+        self.packets.append(items)
+
+        failed = sum(1 for item in items if item["key"] == self.fail_key)
+        info = (
+            f"processed: {len(items) - failed}; failed: {failed}; "
+            f"total: {len(items)}; seconds spent: 0.000100"
+        )
+        body = json.dumps({"response": "success", "info": info}).encode()
+        writer.write(struct.pack("<4sBII", b"ZBXD", 1, len(body), 0) + body)
+        await writer.drain()
+        writer.close()
+
+
+@pytest_asyncio.fixture
+async def trapper():
+    trapper = FakeTrapper(fail_key="bad")
+    server = await asyncio.start_server(trapper.handle, "127.0.0.1", 0)
+    yield trapper, server.sockets[0].getsockname()[1]
+    await run_shutdown()
+    server.close()
+    await server.wait_closed()
+
+
+def _items(n, key="key"):
+    return [{"hostname": "host", "key": key, "value": i} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_send_without_batch(init_context_vars, trapper):
+    server, port = trapper
+    params = {"server": "127.0.0.1", "port": port, "items": _items(3)}
+
+    await ZabbixSend(name="send", param_dict=params).run()
+
+    assert len(server.packets) == 1
+    assert [item["value"] for item in server.packets[0]] == ["0", "1", "2"]
+    assert "clock" not in server.packets[0][0]
+
+
+@pytest.mark.asyncio
+async def test_send_batch_across_executions(init_context_vars, trapper):
+    server, port = trapper
+    params = {"server": "127.0.0.1", "port": port, "batch_size": 5, "chunk_size": 2}
+
+    for i in range(3):
+        node = ZabbixSend(name=f"send{i}", param_dict={**params, "items": _items(2)})
+        await node.run()
+
+    sender = get_sender(
+        "127.0.0.1",
+        port,
+        max_items=5,
+        flush_interval=1.0,
+        chunk_size=2,
+        max_inflight=4,
+        timeout=10,
+    )
+    # the batch of 6 values is sent as 3 packets of chunk_size
+    await asyncio.gather(*sender.tasks)
+    assert [len(p) for p in server.packets] == [2, 2, 2]
+    assert all("clock" in item and "ns" in item for p in server.packets for item in p)
+    assert sender.stats.batches == 1
+    assert sender.stats.processed == 6
+
+
+@pytest.mark.asyncio
+async def test_send_batch_flush_interval(init_context_vars, trapper):
+    server, port = trapper
+    items = [*_items(2), {"hostname": "host", "key": "bad", "value": 0}]
+    params = {
+        "server": "127.0.0.1",
+        "port": port,
+        "items": items,
+        "batch_size": 100,
+        "flush_interval": 0.05,
+    }
+
+    await ZabbixSend(name="send", param_dict=params).run()
+    assert server.packets == []
+
+    await asyncio.sleep(0.2)
+    assert len(server.packets) == 1
+
+    sender = get_sender(
+        "127.0.0.1",
+        port,
+        max_items=100,
+        flush_interval=0.05,
+        chunk_size=250,
+        max_inflight=4,
+        timeout=10,
+    )
+    assert sender.stats.processed == 2
+    assert sender.stats.failed == 1
+    assert sender.stats.total == 3
+
+
+@pytest.mark.asyncio
+async def test_send_batch_flush_on_shutdown(init_context_vars, trapper):
+    server, port = trapper
+    params = {"server": "127.0.0.1", "port": port, "items": _items(2), "batch_size": 10}
+
+    await ZabbixSend(name="send", param_dict=params).run()
+    assert server.packets == []
+
+    await run_shutdown()
+    assert len(server.packets) == 1
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from cauliflow.blackboard import BlackBoard
+
+
+def test_blackboard():
+    bb = BlackBoard()
+
+    bb["a"] = 1
+    bb["a"] = 2
+    assert bb["a"] == 2
+    assert bb == {"a": 2}
+    assert bb.stats.evicted == 0
+    assert bb.stats.expired == 0
+
+
+def test_blackboard_lru():
+    bb = BlackBoard()
+    bb.configure(max_entries=2)
+
+    bb["a"] = 1
+    bb["b"] = 2
+    assert bb["a"] == 1
+    bb["c"] = 3
+
+    assert "b" not in bb
+    assert bb == {"a": 1, "c": 3}
+    assert bb.stats.evicted == 1
+
+
+def test_blackboard_ttl():
+    bb = BlackBoard()
+    bb.configure(ttl=0.1, prefix_ttl={"pv:": 0.0, "pv:keep": 10})
+
+    bb["a"] = 1
+    bb["pv:1"] = 1
+    bb["pv:keep"] = 1
+    bb.set("b", 1, ttl=10)
+
+    assert "pv:1" not in bb
+    assert bb["a"] == 1
+
+    time.sleep(0.2)
+
+    with pytest.raises(KeyError):
+        bb["a"]
+    assert bb == {"pv:keep": 1, "b": 1}
+    assert bb.stats.expired == 2
+
+
+def test_blackboard_ttl_purge_on_write():
+    bb = BlackBoard()
+    bb.configure(ttl=0)
+
+    for i in range(10000):
+        bb.set(f"ts:{i}", i)
+
+    assert len(bb.data) <= 1
+    assert len(bb._expires) <= 1
+    assert bb.stats.expired >= 9999
+
+
+def test_blackboard_lru_drops_expired_first():
+    bb = BlackBoard()
+    bb.configure(max_entries=2)
+
+    bb.set("a", 1)
+    bb.set("b", 2, ttl=0.05)
+    time.sleep(0.1)
+    bb.set("c", 3)
+
+    assert bb == {"a": 1, "c": 3}
+    assert bb.stats.evicted == 0
+    assert bb.stats.expired == 1
@@ -15,3 +15,20 @@ def test_flowdata():
 
     assert d["a"] == 1
     assert d["b"] == 2
+
+
+def test_flowdata_fork():
+    parent = FlowData({"a": 1})
+    d = parent.fork()
+
+    assert d["a"] == 1
+    assert "a" in d
+
+    with pytest.raises(KeyError):
+        d["a"] = 2
+
+    d["b"] = 2
+    assert d == {"a": 1, "b": 2}
+    assert len(d) == 2
+    assert "b" not in parent
+    assert d.copy().parent is None
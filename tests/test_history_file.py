@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from cauliflow.history import HistoryFile, HistoryStore
+
+
+def test_history_file_append_and_query(tmp_path):
+    history = HistoryFile(tmp_path / "pv.hist", index_interval=4)
+    for i in range(10):
+        assert history.append(float(i), i * 0.5, 0, 0)
+    assert not history.append(5.0, 0.0)
+
+    records = history.query(2.0, 5.0)
+    assert records["timestamp"].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert records["value"].tolist() == [1.0, 1.5, 2.0, 2.5]
+    assert np.shares_memory(records, history.records)
+
+    assert len(history.query()) == 10
+    assert len(history.query(start=8.5)) == 1
+    assert len(history.query(end=-1.0)) == 0
+    assert len(history.query(20.0, 30.0)) == 0
+
+
+def test_history_file_grow_and_reopen(tmp_path):
+    path = tmp_path / "pv.hist"
+    history = HistoryFile(path, index_interval=16)
+    capacity = history.capacity
+    for i in range(capacity + 10):
+        history.append(float(i), float(i), 1, 2)
+    assert history.capacity == capacity * 2
+
+    # the views are still valid after the file is grown again
+    view = history.query(0.0, 1.0)
+    for i in range(capacity + 10, capacity * 2 + 10):
+        history.append(float(i), float(i), 1, 2)
+    assert history.capacity == capacity * 4
+    assert view["timestamp"].tolist() == [0.0, 1.0]
+    history.flush()
+
+    reopened = HistoryFile(path)
+    assert reopened.count == capacity * 2 + 10
+    assert reopened.index_interval == 16
+    records = reopened.query(capacity - 1.0, capacity + 1.0)
+    assert records["timestamp"].tolist() == [capacity - 1.0, capacity, capacity + 1.0]
+    assert records["status"].tolist() == [1, 1, 1]
+    assert records["severity"].tolist() == [2, 2, 2]
+
+
+def test_history_file_invalid(tmp_path):
+    path = tmp_path / "pv.hist"
+    path.write_bytes(b"x" * 128)
+    with pytest.raises(ValueError):
+        HistoryFile(path)
+
+
+def test_history_store(tmp_path):
+    store = HistoryStore(tmp_path)
+    assert store.append(
+        {"name": "TEST:PV1", "value": 1.0, "timestamp": 1.0, "status": 0, "severity": 0}
+    )
+    assert not store.append({"name": "TEST:PV1", "ok": False})
+    assert not store.append({"name": "TEST:PV1", "value": "abc", "timestamp": 2.0})
+
+    assert store.query("TEST:PV1")["value"].tolist() == [1.0]
+    assert len(store.query("TEST:PV2")) == 0
+    assert [p.name for p in tmp_path.iterdir()] == ["TEST%3APV1.hist"]
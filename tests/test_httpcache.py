@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from cauliflow.httpcache import CachedResponse, ResponseCache
+
+
+class FakeServer:
+    def __init__(self, etag="v1"):
+        self.etag = etag
+        self.requests = []
+
+    async def fetch(self, headers):
+        self.requests.append(headers)
+        await asyncio.sleep(0.01)
+        if headers.get("If-None-Match") == self.etag:
+            return CachedResponse(304, None)
+        return CachedResponse(200, {"etag": self.etag}, etag=self.etag)
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl():
+    cache = ResponseCache()
+    server = FakeServer()
+
+    assert await cache.get("key", 10, server.fetch) == {"etag": "v1"}
+    assert await cache.get("key", 10, server.fetch) == {"etag": "v1"}
+    assert len(server.requests) == 1
+    assert cache.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_revalidation():
+    cache = ResponseCache()
+    server = FakeServer()
+
+    first = await cache.get("key", 0, server.fetch)
+    second = await cache.get("key", 0, server.fetch)
+    assert second is first
+    assert server.requests == [{}, {"If-None-Match": "v1"}]
+    assert cache.stats.revalidated == 1
+
+    server.etag = "v2"
+    assert await cache.get("key", 0, server.fetch) == {"etag": "v2"}
+
+
+@pytest.mark.asyncio
+async def test_cache_inflight():
+    cache = ResponseCache()
+    server = FakeServer()
+
+    results = await asyncio.gather(
+        *(cache.get("key", 10, server.fetch) for _ in range(5))
+    )
+    assert all(r is results[0] for r in results)
+    assert len(server.requests) == 1
+    assert cache.stats.shared == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_inflight_error():
+    cache = ResponseCache()
+
+    async def fetch(headers):
+        await asyncio.sleep(0.01)
+        raise TimeoutError()
+
+    results = await asyncio.gather(
+        *(cache.get("key", 10, fetch) for _ in range(2)), return_exceptions=True
+    )
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert not cache.inflight
+
+
+@pytest.mark.asyncio
+async def test_cache_inflight_leader_cancelled():
+    cache = ResponseCache()
+    server = FakeServer()
+
+    async def leader():
+        async with asyncio.timeout(0.005):
+            await cache.get("key", 10, server.fetch)
+
+    leader_task = asyncio.create_task(leader())
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get("key", 10, server.fetch))
+
+    with pytest.raises(TimeoutError):
+        await leader_task
+    # the follower makes the request again instead of being cancelled
+    assert await follower == {"etag": "v1"}
+    assert len(server.requests) == 2
+    assert not cache.inflight
+
+
+@pytest.mark.asyncio
+async def test_cache_inflight_follower_cancelled():
+    cache = ResponseCache()
+    server = FakeServer()
+
+    leader = asyncio.create_task(cache.get("key", 10, server.fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get("key", 10, server.fetch))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+    assert await leader == {"etag": "v1"}
+    assert len(server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_lru():
+    cache = ResponseCache(max_entries=2)
+    server = FakeServer()
+
+    for key in ["a", "b", "a", "c"]:
+        await cache.get(key, 10, server.fetch)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats.evicted == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_error_status():
+    cache = ResponseCache()
+
+    async def fetch(headers):
+        return CachedResponse(500, {"status": 500})
+
+    await cache.get("key", 10, fetch)
+    assert not cache.entries
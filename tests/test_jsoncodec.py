@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from epicscorelibs.ca.dbr import ca_array, ca_float, ca_int, ca_str
+
+from cauliflow import jsoncodec
+
+
+def test_dumps_builtin():
+    assert jsoncodec.loads(jsoncodec.dumps({"a": [1, 2.5, "x", None, True]})) == {
+        "a": [1, 2.5, "x", None, True]
+    }
+
+
+def test_dumps_numpy():
+    data = {"arr": np.array([1.0, 2.0]), "int": np.int32(3), "float": np.float32(0.5)}
+    assert jsoncodec.loads(jsoncodec.dumps(data)) == {
+        "arr": [1.0, 2.0],
+        "int": 3,
+        "float": 0.5,
+    }
+
+
+def test_dumps_others():
+    data = {"dt": datetime(2025, 1, 1), "set": {1}, "obj": object}
+    assert jsoncodec.loads(jsoncodec.dumps(data)) == {
+        "dt": "2025-01-01T00:00:00",
+        "set": [1],
+        "obj": "<class 'object'>",
+    }
+
+
+def test_dumps_augmented():
+    value = ca_float(7.0)
+    value.name = "TEST:PV1"
+    array = np.array([1, 2]).view(ca_array)
+    data = [value, ca_int(3), ca_str("abc"), array]
+    assert jsoncodec.loads(jsoncodec.dumps(data)) == [7.0, 3, "abc", [1, 2]]
+
+
+def test_set_backend():
+    backend = jsoncodec.BACKEND
+    try:
+        jsoncodec.set_backend("json")
+        assert jsoncodec.loads(b'{"a": 1}') == {"a": 1}
+        with pytest.raises(ValueError):
+            jsoncodec.set_backend("unknown")
+    finally:
+        jsoncodec.set_backend(backend)
+
+
+def test_orjson_backend():
+    pytest.importorskip("orjson")
+    backend = jsoncodec.BACKEND
+    try:
+        jsoncodec.set_backend("orjson")
+        value = ca_float(7.0)
+        value.name = "TEST:PV1"
+        data = {
+            "arr": np.array([1.0, 2.0]),
+            "int": np.int32(3),
+            "pv": value,
+            "dt": datetime(2025, 1, 1),
+            "set": {1},
+        }
+        text = jsoncodec.dumps(data)
+        assert isinstance(text, str)
+        assert jsoncodec.loads(text) == {
+            "arr": [1.0, 2.0],
+            "int": 3,
+            "pv": 7.0,
+            "dt": "2025-01-01T00:00:00",
+            "set": [1],
+        }
+        assert jsoncodec.loads(b'{"a": 1}') == {"a": 1}
+    finally:
+        jsoncodec.set_backend(backend)
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_dumps_nonfinite(backend):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    current = jsoncodec.BACKEND
+    try:
+        jsoncodec.set_backend(backend)
+        data = {
+            "nan": float("nan"),
+            "inf": np.float64("inf"),
+            "arr": np.array([1.0, -np.inf]),
+            "list": [ca_float(np.nan), 2.5],
+        }
+        assert jsoncodec.dumps(data) == (
+            '{"nan":null,"inf":null,"arr":[1.0,null],"list":[null,2.5]}'
+        )
+    finally:
+        jsoncodec.set_backend(current)